@@ -0,0 +1,279 @@
+"""
+Local tournament arena: many games run concurrently on one asyncio event loop, with every bot in its own subprocess.
+Run from `src/`, e.g.:
+    python -m arena --bot random="python bot_process.py random" --bot priority="python bot_process.py priority"
+
+Bots speak JSON lines over stdin/stdout:
+    arena -> bot  {"type": "hello"}                                     bot -> arena  {"name": ...}
+    arena -> bot  {"type": "new_game", "seat", "players", "layout", "actions"}
+    arena -> bot  {"type": "place", "observation", "legal"}             bot -> arena  {"action": vertex}
+    arena -> bot  {"type": "act", "phase", "observation", "legal"}      bot -> arena  {"action": action}
+    arena -> bot  {"type": "game_over", "winner"}
+Observations and actions are laid out as in `encoder`; "layout" and "actions" give the section offsets.
+Turns follow the phases of `turns.TurnMachine`, so a bot is also asked to discard when another player rolls a 7.
+A bot that answers late, answers with an illegal move or crashes forfeits that move (ending its turn, or a random
+choice in other phases and starting placements) and its process is replaced before its next move, so a slow or broken
+bot never stalls the other games. A bot whose process can't start forfeits its moves until the next game.
+Games share the global random module while interleaved, so arena games are not reproducible from a seed.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import sys
+from random import choice
+from typing import Dict, List
+from game import Game, Player
+from encoder import ObservationEncoder, ActionSpace
+from bots import Bot
+from turns import TurnMachine, Phase
+from trade import TradeEngine
+
+# the reference bot, by path so that its commands work from any directory
+BOT_PROCESS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_process.py")
+
+class BotProcess:
+    """One running bot subprocess and the pipes to talk to it"""
+
+    def __init__(self, name: str, command: str):
+        self.name = name
+        self.command = command
+        self.process: asyncio.subprocess.Process | None = None
+        self.alive = False
+        self.started = False
+        self.faults = 0
+
+    async def start(self, timeout: float) -> bool:
+        """Start the bot and wait for its greeting; False (and a dead process) if it can't start or answer in time"""
+        try:
+            self.process = await asyncio.create_subprocess_exec(*shlex.split(self.command),
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        except OSError:
+            self.fail()
+            return False
+        self.alive = True
+        self.started = await self.request({"type": "hello"}, timeout) is not None
+        return self.started
+
+    async def send(self, message: Dict):
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.write(json.dumps(message).encode() + b"\n")
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            self.fail()
+
+    async def request(self, message: Dict, timeout: float) -> Dict | None:
+        """Send a message and wait for the reply; None if the bot is dead, late or unreadable (a fault)"""
+        await self.send(message)
+        if not self.alive:
+            return None
+        try:
+            line = await asyncio.wait_for(self.process.stdout.readline(), timeout)
+            return json.loads(line)
+        except (asyncio.TimeoutError, ValueError):
+            self.fail()
+            return None
+
+    def fail(self):
+        """Record a fault and kill the process, so its pool replaces it"""
+        self.faults += 1
+        self.kill()
+
+    def kill(self):
+        self.alive = False
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+
+class BotPool:
+    """Warm processes of one bot, handed out per game and reused, so process startup isn't paid every game"""
+
+    def __init__(self, name: str, command: str, startup_time: float):
+        self.name = name
+        self.command = command
+        self.startup_time = startup_time
+        self.idle: List[BotProcess] = []
+        self.processes: List[BotProcess] = []
+
+    async def acquire(self) -> BotProcess:
+        """An idle live process, or a freshly started one (which is dead if it failed to start)"""
+        while self.idle:
+            process = self.idle.pop()
+            if process.alive:
+                return process
+        process = BotProcess(self.name, self.command)
+        self.processes.append(process)
+        await process.start(self.startup_time)
+        return process
+
+    def release(self, process: BotProcess):
+        if process.alive:
+            self.idle.append(process)
+
+    async def close(self):
+        for process in self.processes:
+            process.kill()
+            if process.process is not None:
+                await process.process.wait()
+        self.idle = []
+
+    @property
+    def faults(self) -> int:
+        return sum(process.faults for process in self.processes)
+
+class Arena:
+    """Schedules tables of bots, plays them concurrently and keeps Elo ratings"""
+
+    def __init__(self, commands: Dict[str, str], seats: int = 4, move_time: float = 1.0, startup_time: float = 10.0,
+            concurrency: int = 8, max_rounds: int = 500, k_factor: float = 16):
+        self.pools = {name: BotPool(name, command, startup_time) for name, command in commands.items()}
+        self.seats = seats
+        self.move_time = move_time
+        self.slots = asyncio.Semaphore(concurrency)
+        self.max_rounds = max_rounds
+        self.k_factor = k_factor
+        self.ratings = {name: 1500.0 for name in commands}
+        self.games = dict.fromkeys(commands, 0)
+        self.wins = dict.fromkeys(commands, 0)
+
+    def pairings(self, round_idx: int, mode: str) -> List[List[str]]:
+        """
+        Tables for one round. Round robin keeps a fixed order, Swiss seats bots next to similarly rated ones.
+        Every bot plays every round; a short last table is filled by wrapping around the order.
+        Seats are rotated each round so no bot always moves first.
+        """
+        order = sorted(self.ratings)
+        if mode == "round-robin":
+            order = order[round_idx % len(order):] + order[:round_idx % len(order)]
+        else:
+            order = sorted(order, key=lambda name: self.ratings[name], reverse=True)
+        tables = [[order[(start + e) % len(order)] for e in range(self.seats)]
+            for start in range(0, len(order), self.seats)]
+        return [table[round_idx % self.seats:] + table[:round_idx % self.seats] for table in tables]
+
+    async def ask(self, process: BotProcess, kind: str, observation: memoryview, legal: List[int],
+            phase: Phase | None = None) -> int | None:
+        """The bot's choice from `legal`, or None if it forfeits the move"""
+        if not process.alive:
+            return None
+        message = {"type": kind, "observation": observation.tolist(), "legal": legal}
+        if phase is not None:
+            message["phase"] = phase.name
+        reply = await process.request(message, self.move_time)
+        action = reply.get("action") if isinstance(reply, dict) else None
+        if type(action) is not int or action not in legal: # 5.0 and True equal legal ints, but can't index
+            if process.alive: # an answer, but not a legal one
+                process.fail()
+            return None
+        return action
+
+    async def play(self, lineup: List[str]) -> Player | None:
+        async with self.slots:
+            players = [Player(f"{name} {e}") for e, name in enumerate(lineup)]
+            game = Game(players=players)
+            encoder = ObservationEncoder(game)
+            actions = ActionSpace(game, TradeEngine(game))
+            machine = TurnMachine(game, actions)
+            placer = Bot(game)
+            processes = [await self.pools[name].acquire() for name in lineup]
+            seat_of = {player: e for e, player in enumerate(players)}
+            winner = None
+            new_game = {"type": "new_game", "players": len(players), "layout": encoder.offsets,
+                "actions": {"size": actions.size, "road": actions.road_offset,
+                "settlement": actions.settlement_offset, "city": actions.city_offset,
+                "knight": actions.knight_offset, "discard": actions.discard_offset,
+                "robber": actions.robber_offset, "steal": actions.steal_offset, "roll": actions.roll_action,
+                "trade": actions.trade_action}}
+
+            async def seat_process(seat: int) -> BotProcess:
+                """The seat's process, replaced mid-game if it faulted (one that never started isn't retried)"""
+                process = processes[seat]
+                if not process.alive and process.started:
+                    process = processes[seat] = await self.pools[lineup[seat]].acquire()
+                    await process.send({**new_game, "seat": seat})
+                return process
+
+            try:
+                for seat, process in enumerate(processes):
+                    await process.send({**new_game, "seat": seat})
+                for e, player in enumerate(players + players[::-1]):
+                    legal = placer.open_vertices()
+                    vertex = await self.ask(await seat_process(seat_of[player]), "place", encoder.encode(player), legal)
+                    settlement = placer.settle(player, choice(legal) if vertex is None else vertex)
+                    if e >= len(players):
+                        game.collect_starting_resources(player, settlement)
+                while machine.phase is not Phase.Over and game.round <= self.max_rounds:
+                    player = machine.actor
+                    legal = [e for e, legal in enumerate(machine.legal_mask()) if legal]
+                    action = await self.ask(await seat_process(seat_of[player]), "act", encoder.encode(player), legal,
+                        machine.phase)
+                    if action is None:
+                        action = 0 if machine.phase is Phase.Build else choice(legal)
+                    machine.step(action)
+                winner = machine.winner
+                for process in processes:
+                    await process.send({"type": "game_over",
+                        "winner": None if winner is None else seat_of[winner]})
+            finally:
+                for process, name in zip(processes, lineup):
+                    self.pools[name].release(process)
+            self.record(lineup, None if winner is None else seat_of[winner])
+            return winner
+
+    def record(self, lineup: List[str], winning_seat: int | None):
+        """Count the game and move Elo ratings: the winner beats every other bot at the table"""
+        for name in set(lineup):
+            self.games[name] += 1
+        if winning_seat is None:
+            return
+        winner = lineup[winning_seat]
+        self.wins[winner] += 1
+        winner_rating = self.ratings[winner] # every pairing is scored against the ratings before this game
+        for loser in set(lineup) - {winner}:
+            expected = 1 / (1 + 10 ** ((self.ratings[loser] - winner_rating) / 400))
+            self.ratings[winner] += self.k_factor * (1 - expected)
+            self.ratings[loser] -= self.k_factor * (1 - expected)
+
+    async def run(self, rounds: int, mode: str = "swiss"):
+        try:
+            for round_idx in range(rounds):
+                await asyncio.gather(*(self.play(table) for table in self.pairings(round_idx, mode)))
+        finally:
+            for pool in self.pools.values():
+                await pool.close()
+
+    def standings(self) -> str:
+        lines = []
+        for name in sorted(self.ratings, key=lambda name: self.ratings[name], reverse=True):
+            pool = self.pools[name]
+            lines.append(f"{name}: {self.ratings[name]:.0f} Elo, {self.wins[name]}/{self.games[name]} wins, "
+                f"{pool.faults} faults, {len(pool.processes)} processes started")
+        return "\n".join(lines)
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="arena", description="Run a tournament between subprocess bots")
+    parser.add_argument("--bot", action="append", default=[], metavar="NAME=COMMAND",
+        help="a bot and the command starting it (repeatable); defaults to the bot_process policies")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--mode", default="swiss", choices=["swiss", "round-robin"])
+    parser.add_argument("--seats", type=int, default=4)
+    parser.add_argument("--move-time", type=float, default=1.0, help="seconds a bot has for each move")
+    parser.add_argument("--startup-time", type=float, default=10.0, help="seconds a new bot process has to answer")
+    parser.add_argument("--concurrency", type=int, default=8, help="games played at the same time")
+    parser.add_argument("--max-rounds", type=int, default=500, help="rounds after which a game is abandoned")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None):
+    args = parse_args(argv)
+    commands = dict(bot.split("=", 1) for bot in args.bot) or {
+        policy: f"{sys.executable} {BOT_PROCESS} {policy}" for policy in ("random", "priority")
+    }
+    arena = Arena(commands, args.seats, args.move_time, args.startup_time, args.concurrency, args.max_rounds)
+    asyncio.run(arena.run(args.rounds, args.mode))
+    print(arena.standings())
+
+if __name__ == "__main__":
+    main()
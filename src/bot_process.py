@@ -0,0 +1,65 @@
+"""
+A bot that plays over the arena's JSON-lines protocol on stdin/stdout, e.g. `python -m bot_process priority`.
+It only sees what the arena sends, so it also serves as a reference for bots written outside this project.
+"""
+from __future__ import annotations
+import json
+import sys
+from random import choice
+from typing import Dict, List
+
+def random_policy(message: Dict, game: Dict) -> int:
+    return choice(message["legal"])
+
+def priority_policy(message: Dict, game: Dict) -> int:
+    """
+    Prefer cities, then settlements, knights, development cards, trades and roads, ending the turn last.
+    Outside the build phase, any legal choice will do.
+    """
+    legal = message["legal"]
+    if message["type"] == "place" or message.get("phase", "Build") != "Build":
+        return choice(legal)
+    actions = game["actions"]
+    ranges = [
+        (actions["city"], actions["knight"]),
+        (actions["settlement"], actions["city"]),
+        (actions["knight"], actions.get("discard", actions["size"])),
+        (1, 2),
+        (actions.get("trade", -1), actions.get("trade", -1) + 1),
+        (actions["road"], actions["settlement"])
+    ]
+    for start, stop in ranges:
+        options = [action for action in legal if start <= action < stop]
+        if options:
+            return choice(options)
+    return 0
+
+POLICIES = {
+    "random": random_policy,
+    "priority": priority_policy
+}
+
+def serve(policy_name: str, stdin=sys.stdin, stdout=sys.stdout):
+    policy = POLICIES[policy_name]
+    game: Dict = {}
+    for line in stdin:
+        message = json.loads(line)
+        match message["type"]:
+            case "hello":
+                reply = {"name": policy_name}
+            case "new_game":
+                game = message
+                continue
+            case "place" | "act":
+                reply = {"action": policy(message, game)}
+            case _:
+                continue
+        stdout.write(json.dumps(reply) + "\n")
+        stdout.flush()
+
+def main(argv: List[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    serve(argv[0] if argv else "random")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Built-in computer players, usable as the `option` of `Game.game_wrapper`"""
+from __future__ import annotations
+from array import array
+from random import choice
+from typing import Dict, List, Tuple
+from game import Game, Player, Tile, Road, SettlementOrCity, Resource
+from encoder import ActionSpace
+from trade import BUILDS, build_valuation
+from turns import TurnMachine, Phase
+
+def pips(number: int) -> int:
+    """How many of the 36 dice outcomes produce a number token"""
+    return 0 if number == 0 else 6 - abs(7 - number)
+
+class Bot:
+    """
+    Base controller for one game: picks actions from the game's `ActionSpace` until it ends its turn.
+    Subclasses override `choose`, and can override `place_initial` for the setup phase.
+    `choose` also serves as the `decide` of `turns.TurnMachine.play`, whose masks cover the other turn phases.
+    """
+
+    def __init__(self, game: Game):
+        self.game = game
+        self.actions = ActionSpace(game)
+        self.vertex_values: List[int] = [self.vertex_value(tile, idx) for tile, idx in game.board.vertices]
+
+    @staticmethod
+    def vertex_value(tile: Tile, vertex_idx: int) -> int:
+        """Total pips of the tiles meeting at a vertex"""
+        return sum(pips(other.number) for other in [tile] + tile.vertex_neighbours(vertex_idx) if other is not None)
+
+    def __call__(self, player: Player):
+        while action := self.choose(player, self.actions.legal_mask(player)):
+            self.actions.apply(player, action)
+
+    def choose(self, player: Player, mask) -> int:
+        raise NotImplementedError
+
+    def open_vertices(self) -> List[int]:
+        return [e for e, (tile, idx) in enumerate(self.game.board.vertices)
+            if tile.construction_slots[idx] is None and not tile.adjacent_settlements(idx)]
+
+    def place_initial(self, player: Player) -> SettlementOrCity:
+        """Settle the most productive open vertex, with a road leading away from it"""
+        vertex = max(self.open_vertices(), key=lambda v: self.vertex_values[v])
+        return self.settle(player, vertex)
+
+    def settle(self, player: Player, vertex: int) -> SettlementOrCity:
+        tile, idx = self.game.board.vertices[vertex]
+        settlement = SettlementOrCity(player, tile, idx)
+        # the two edges of this tile meeting the vertex, then the third edge on the neighbouring tile
+        candidates = [(tile, idx), (tile, (idx - 1) % 6)]
+        if tile.neighbours[idx] is not None:
+            candidates.append((tile.neighbours[idx], (idx + 4) % 6))
+        free = [(road_tile, road_idx) for road_tile, road_idx in candidates if road_tile.road_slots[road_idx] is None]
+        if free:
+            Road(player, *choice(free))
+        return settlement
+
+class RandomBot(Bot):
+    """Takes a uniformly random legal action, ending the turn being one of them"""
+
+    def choose(self, player: Player, mask) -> int:
+        return choice([e for e, legal in enumerate(mask) if legal])
+
+    def place_initial(self, player: Player) -> SettlementOrCity:
+        return self.settle(player, choice(self.open_vertices()))
+
+class GreedyBot(Bot):
+    """
+    Builds cities, then settlements on the best vertices, then development cards, then trades, and roads last.
+    Discards its most plentiful resource, and robs the best-stocked player.
+    """
+
+    def choose(self, player: Player, mask) -> int:
+        actions = self.actions
+        players = self.game.players
+        if mask[actions.roll_action]:
+            return actions.roll_action
+        discards = [r for r in range(len(Resource)) if mask[actions.discard_offset + r]]
+        if discards:
+            return actions.discard_offset + max(discards, key=lambda r: player.resources.count(Resource(r + 1)))
+        tiles = [t for t in range(len(self.game.board.flat_tiles)) if mask[actions.robber_offset + t]]
+        if tiles:
+            return actions.robber_offset + self.robber_target(player, tiles)
+        victims = [seat for seat in range(len(players)) if mask[actions.steal_offset + seat]]
+        if victims:
+            return actions.steal_offset + max(victims, key=lambda seat: len(players[seat].resources))
+        vertices = len(self.game.board.vertices)
+        for offset in (actions.city_offset, actions.settlement_offset):
+            legal = [v for v in range(vertices) if mask[offset + v]]
+            if legal:
+                return offset + max(legal, key=lambda v: self.vertex_values[v])
+        knights = [t for t in range(len(self.game.board.flat_tiles)) if mask[actions.knight_offset + t]]
+        if knights:
+            return actions.knight_offset + self.robber_target(player, knights)
+        if mask[1]:
+            return 1
+        if mask[actions.trade_action]:
+            return actions.trade_action
+        roads = [e for e in range(actions.road_offset, actions.settlement_offset) if mask[e]]
+        if roads:
+            return choice(roads)
+        return 0
+
+    def robber_target(self, player: Player, tiles: List[int]) -> int:
+        """Block the tile producing most for opponents, and nothing for `player`"""
+        flat_tiles = self.game.board.flat_tiles
+        def harm(t: int) -> int:
+            owners = [slot.owner for slot in set(flat_tiles[t].construction_slots) if slot is not None]
+            if player in owners:
+                return -1
+            return pips(flat_tiles[t].number) * len(owners)
+        return max(tiles, key=harm)
+
+class RolloutBot(Bot):
+    """
+    A fast policy for playouts, compiled into lookup tables: the builds to try and the resource to discard for
+    every hand (counts of each resource up to `hand_limit`), vertices and edges ranked by the pips they reach,
+    and tiles ranked as robber targets. Each decision is a few table reads and placement checks.
+    As a `Game.game_wrapper` option it builds without computing legal masks; `playout` does the same for
+    a `turns.TurnMachine`, e.g. to estimate a position during search. It never trades.
+    """
+
+    hand_limit = 4
+    # shared by every instance: the tables depend only on the hand
+    priorities: List[Tuple[str, ...]] = []
+    discards = array("b")
+
+    def __init__(self, game: Game):
+        super().__init__(game)
+        board = game.board
+        if not RolloutBot.priorities:
+            RolloutBot.compile_hands()
+        self.places = [(resource, (self.hand_limit + 1) ** r) for r, resource in enumerate(Resource)]
+        self.vertex_order = array("h", sorted(range(len(board.vertices)), key=lambda v: -self.vertex_values[v]))
+        edge_values = [self.vertex_values[board.vertex_ids[(tile, idx)]] +
+            self.vertex_values[board.vertex_ids[(tile, (idx + 1) % 6)]] for tile, idx in board.edges]
+        self.edge_order = array("h", sorted(range(len(board.edges)), key=lambda e: -edge_values[e]))
+        self.tile_order = array("h", sorted(range(len(board.flat_tiles)),
+            key=lambda t: -pips(board.flat_tiles[t].number)))
+
+    @classmethod
+    def compile_hands(cls):
+        """
+        For every hand: the affordable builds, best first by their weight in `trade.BUILDS` and then by what the
+        rest of the hand is still worth, and the resource whose loss costs the hand least.
+        """
+        base = cls.hand_limit + 1
+        priorities, discards, interned = [], array("b"), {}
+        for index in range(base ** len(Resource)):
+            hand = [index // base ** r % base for r in range(len(Resource))]
+            ranked = []
+            for item, need, weight in BUILDS:
+                if all(have >= needed for have, needed in zip(hand, need)):
+                    rest = tuple(have - needed for have, needed in zip(hand, need))
+                    ranked.append((weight, build_valuation(None, rest), item)) # which ignores the player
+            order = tuple(item for _, _, item in sorted(ranked, reverse=True))
+            priorities.append(interned.setdefault(order, order))
+            held = [r for r in range(len(Resource)) if hand[r]]
+            discards.append(max(held, key=lambda r: (build_valuation(None, tuple(have - (s == r)
+                for s, have in enumerate(hand))), hand[r])) if held else -1)
+        cls.priorities, cls.discards = priorities, discards
+
+    def hand_index(self, player: Player) -> int:
+        resources, limit = player.resources, self.hand_limit
+        index = 0
+        for resource, place in self.places:
+            count = resources.count(resource)
+            index += (count if count < limit else limit) * place
+        return index
+
+    def robber_target(self, player: Player) -> int:
+        """The richest tile next to an opponent and not to `player`, else the richest without `player`"""
+        board = self.game.board
+        fallback = -1
+        for t in self.tile_order:
+            tile = board.flat_tiles[t]
+            if tile is board.robber_tile:
+                continue
+            mine = theirs = False
+            for slot in tile.construction_slots:
+                if slot is not None:
+                    if slot.owner is player:
+                        mine = True
+                    else:
+                        theirs = True
+            if not mine:
+                if theirs:
+                    return t
+                if fallback < 0:
+                    fallback = t
+        return fallback if fallback >= 0 else next(t for t in self.tile_order
+            if board.flat_tiles[t] is not board.robber_tile)
+
+    def build(self, player: Player, mask=None) -> int:
+        """
+        The building-phase action: play a knight, then try the hand's builds in table order on the best ranked
+        vertices and edges. Without a legal `mask`, placements are checked one at a time until one fits.
+        """
+        actions, board = self.actions, self.game.board
+        if actions.usable_knight(player) is not None:
+            target = self.robber_target(player)
+            if mask is None or mask[actions.knight_offset + target]:
+                return actions.knight_offset + target
+        for item in self.priorities[self.hand_index(player)]:
+            match item:
+                case "City" | "Settlement":
+                    offset = actions.city_offset if item == "City" else actions.settlement_offset
+                    for v in self.vertex_order:
+                        if mask[offset + v] if mask is not None else player.can_place(item, *board.vertices[v]):
+                            return offset + v
+                case "Development Card":
+                    if mask[1] if mask is not None else len(self.game.development_cards) > 0:
+                        return 1
+                case "Road":
+                    for e in self.edge_order:
+                        if mask[actions.road_offset + e] if mask is not None else player.can_place(item, *board.edges[e]):
+                            return actions.road_offset + e
+        return 0
+
+    def choose(self, player: Player, mask) -> int:
+        actions = self.actions
+        if mask[actions.roll_action]:
+            return actions.roll_action
+        discard = self.discards[self.hand_index(player)]
+        if discard >= 0 and mask[actions.discard_offset + discard]:
+            return actions.discard_offset + discard
+        # the robber stands on at most one of the two richest tiles, so the other is legal when moving it is
+        if mask[actions.robber_offset + self.tile_order[0]] or mask[actions.robber_offset + self.tile_order[1]]:
+            return actions.robber_offset + self.robber_target(player)
+        victim, most = -1, -1
+        for seat, other in enumerate(self.game.players):
+            if mask[actions.steal_offset + seat] and len(other.resources) > most:
+                victim, most = seat, len(other.resources)
+        if victim >= 0:
+            return actions.steal_offset + victim
+        return self.build(player, mask)
+
+    def __call__(self, player: Player):
+        while action := self.build(player):
+            self.actions.apply(player, action)
+
+    def playout(self, machine: TurnMachine, max_rounds: int | None = None) -> Player | None:
+        """
+        Play `machine`'s game out with this policy in every seat and return the winner, like `TurnMachine.play`,
+        but without computing a legal mask for building decisions
+        """
+        game = self.game
+        while machine.phase is not Phase.Over and (max_rounds is None or game.round <= max_rounds):
+            if machine.phase is Phase.Build:
+                machine.step(self.build(machine.actor))
+            else:
+                machine.step(self.choose(machine.actor, machine.legal_mask()))
+        return machine.winner
+
+BOTS: Dict[str, type] = {
+    "random": RandomBot,
+    "greedy": GreedyBot,
+    "rollout": RolloutBot
+}
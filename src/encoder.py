@@ -0,0 +1,227 @@
+"""Fixed-size observation and action encodings of a game, for machine learning agents"""
+from __future__ import annotations
+from array import array
+from random import choice
+from typing import Dict, List, Tuple
+from game import Game, Player, Tile, Construction, DevelopmentCard, Resource
+
+class ObservationEncoder:
+    """
+    Writes the state of a `Game`, seen from one player's seat, into a single preallocated float32 buffer.
+    The buffer is reused by every call and supports the buffer protocol, so it can be wrapped without copying,
+    e.g. `numpy.frombuffer(encoder.buffer, dtype=numpy.float32)`.
+    Players are ordered relative to the perspective: the observing player is always seat 0.
+    """
+
+    terrains = list(Tile.resource_dict)
+    card_types = ["knight", "victory point", "road building", "year of plenty", "monopoly"]
+    tile_features = len(terrains) + 1 # terrain one-hot and number token
+    harbour_features = 6 # general harbour then one per resource
+    player_features = 6 # hand size, development cards, army, victory points, largest army, longest road
+
+    def __init__(self, game: Game):
+        self.game = game
+        board = game.board
+        players = len(game.players)
+        self.tile_ids: Dict[Tile, int] = {tile: e for e, tile in enumerate(board.flat_tiles)}
+        self.card_ids = {card_type: e for e, card_type in enumerate(self.card_types)}
+        # one seat lookup per perspective, so encoding a state doesn't build any
+        self.seats: List[Dict[Player, int]] = [
+            {player: (f - e) % players for f, player in enumerate(game.players)} for e in range(players)
+        ]
+        sections = [
+            ("tiles", len(board.flat_tiles) * self.tile_features),
+            ("harbours", len(board.vertices) * self.harbour_features),
+            ("robber", len(board.flat_tiles)),
+            ("vertices", len(board.vertices) * players * 2),
+            ("edges", len(board.edges) * players),
+            ("hand", 5),
+            ("development cards", len(self.card_types)),
+            ("players", players * self.player_features),
+            ("globals", 2)
+        ]
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        size = 0
+        for name, length in sections:
+            self.offsets[name] = (size, length)
+            size += length
+        self.size = size
+        self.buffer = array("f", bytes(4 * size))
+        self.view = memoryview(self.buffer)
+        self.dynamic_start = self.offsets["robber"][0]
+        self.blank = memoryview(array("f", bytes(4 * (size - self.dynamic_start))))
+        self.encode_static()
+
+    def encode_static(self):
+        """Write the parts of the board that never change during a game (terrain, numbers, harbours)"""
+        board = self.game.board
+        buffer = self.buffer
+        start = self.offsets["tiles"][0]
+        for e, tile in enumerate(board.flat_tiles):
+            base = start + e * self.tile_features
+            buffer[base + self.terrains.index(tile.terrain)] = 1
+            buffer[base + len(self.terrains)] = tile.number
+        start = self.offsets["harbours"][0]
+        for e, (tile, idx) in enumerate(board.vertices):
+            harbour = tile.harbour_slots[idx]
+            if harbour is None: # harbours are only recorded on one of the tiles sharing the vertex
+                harbour = next((alias.harbour_slots[alias_idx] for alias, alias_idx in
+                    Tile.slot_idx_gen([tile] + tile.vertex_neighbours(idx), idx)
+                    if alias is not None and alias.harbour_slots[alias_idx] is not None), None)
+            if harbour is not None:
+                buffer[start + e * self.harbour_features + (harbour.resource.value if harbour.resource else 0)] = 1
+
+    def encode(self, player: Player) -> memoryview:
+        """Overwrite the dynamic part of the buffer with the state seen by `player` and return a view of it"""
+        game = self.game
+        board = game.board
+        buffer = self.buffer
+        seat = self.seats[game.players.index(player)]
+        players = len(game.players)
+        self.view[self.dynamic_start:] = self.blank
+        buffer[self.offsets["robber"][0] + self.tile_ids[board.robber_tile]] = 1
+        start = self.offsets["vertices"][0]
+        for e, (tile, idx) in enumerate(board.vertices):
+            construction = tile.construction_slots[idx]
+            if construction is not None:
+                buffer[start + (e * players + seat[construction.owner]) * 2 + (construction.name == "City")] = 1
+        start = self.offsets["edges"][0]
+        for e, (tile, idx) in enumerate(board.edges):
+            road = tile.road_slots[idx]
+            if road is not None:
+                buffer[start + e * players + seat[road.owner]] = 1
+        start = self.offsets["hand"][0] - 1 # resource values start at 1
+        for resource in player.resources:
+            buffer[start + resource.value] += 1
+        start = self.offsets["development cards"][0]
+        for card in player.development_cards:
+            buffer[start + self.card_ids[card.card_type]] += 1
+        start = self.offsets["players"][0]
+        public = game.ledger.public
+        for other in game.players:
+            base = start + seat[other] * self.player_features
+            buffer[base] = len(other.resources)
+            buffer[base + 1] = len(other.development_cards)
+            buffer[base + 2] = other.army_count
+            buffer[base + 3] = public[game.ledger.index[other]]
+            buffer[base + 4] = other is game.player_with_largest_army
+            buffer[base + 5] = other is game.player_with_longest_road
+        start = self.offsets["globals"][0]
+        buffer[start] = len(game.development_cards)
+        buffer[start + 1] = game.round
+        return self.view
+
+class ActionSpace:
+    """
+    A fixed-size integer action space for one board, laid out as:
+    end turn, buy development card, one road per edge, one settlement per vertex, one city per vertex
+    and one knight (robber move) per tile. `legal_mask` fills a reusable byte mask over that range.
+    The turn phases of `turns.TurnMachine` add one discard per resource, one robber move per tile,
+    one steal per seat and rolling the dice. Last comes trading: given a `trade.TradeEngine`, that action makes
+    the best trade another player accepts, and is legal whenever there is one.
+    """
+
+    def __init__(self, game: Game, trades=None):
+        self.game = game
+        self.trades = trades
+        board = game.board
+        self.road_offset = 2
+        self.settlement_offset = self.road_offset + len(board.edges)
+        self.city_offset = self.settlement_offset + len(board.vertices)
+        self.knight_offset = self.city_offset + len(board.vertices)
+        self.discard_offset = self.knight_offset + len(board.flat_tiles)
+        self.robber_offset = self.discard_offset + len(Resource)
+        self.steal_offset = self.robber_offset + len(board.flat_tiles)
+        self.roll_action = self.steal_offset + len(game.players)
+        self.trade_action = self.roll_action + 1
+        self.size = self.trade_action + 1
+        self.mask = array("b", bytes(self.size))
+        self.blank = array("b", bytes(self.size))
+
+    def decode(self, action: int) -> Tuple[str, int]:
+        """Split an action into its kind and the edge, vertex or tile index it applies to"""
+        assert 0 <= action < self.size
+        if action == 0:
+            return "End Turn", 0
+        if action == 1:
+            return "Development Card", 0
+        if action < self.settlement_offset:
+            return "Road", action - self.road_offset
+        if action < self.city_offset:
+            return "Settlement", action - self.settlement_offset
+        if action < self.knight_offset:
+            return "City", action - self.city_offset
+        if action < self.discard_offset:
+            return "Knight", action - self.knight_offset
+        if action < self.robber_offset:
+            return "Discard", action - self.discard_offset
+        if action < self.steal_offset:
+            return "Robber", action - self.robber_offset
+        if action < self.roll_action:
+            return "Steal", action - self.steal_offset
+        if action == self.roll_action:
+            return "Roll", 0
+        return "Trade", 0
+
+    @staticmethod
+    def usable_knight(player: Player) -> DevelopmentCard | None:
+        """A knight `player` may play now: bought before this turn, and no other card played during it"""
+        if player.played_card:
+            return None
+        return next((card for card in player.development_cards
+            if card.card_type == "knight" and card.can_use), None)
+
+    def legal_mask(self, player: Player) -> array:
+        """Mark every action `player` could take right now with a 1"""
+        game = self.game
+        board = game.board
+        mask = self.mask
+        mask[:] = self.blank
+        mask[0] = 1
+        if game.development_cards and Construction.has_resources_for(player, "Development Card"):
+            mask[1] = 1
+        if Construction.has_resources_for(player, "Road"):
+            for e, (tile, idx) in enumerate(board.edges):
+                if player.can_place("Road", tile, idx):
+                    mask[self.road_offset + e] = 1
+        has_settlement_resources = Construction.has_resources_for(player, "Settlement")
+        has_city_resources = Construction.has_resources_for(player, "City")
+        if has_settlement_resources or has_city_resources:
+            for e, (tile, idx) in enumerate(board.vertices):
+                if has_settlement_resources and player.can_place("Settlement", tile, idx):
+                    mask[self.settlement_offset + e] = 1
+                elif has_city_resources and player.can_place("City", tile, idx):
+                    mask[self.city_offset + e] = 1
+        if self.usable_knight(player) is not None:
+            for e, tile in enumerate(board.flat_tiles):
+                if tile is not board.robber_tile:
+                    mask[self.knight_offset + e] = 1
+        if self.trades is not None and self.trades.best_trade(player) is not None:
+            mask[self.trade_action] = 1
+        return mask
+
+    def apply(self, player: Player, action: int):
+        """Carry out a legal action for `player`; a knight steals from a random player on its new tile"""
+        game = self.game
+        board = game.board
+        kind, idx = self.decode(action)
+        match kind:
+            case "End Turn":
+                pass
+            case "Development Card":
+                player.build(kind, stack=game.development_cards)
+            case "Road":
+                player.build(kind, *board.edges[idx])
+            case "Settlement":
+                player.build(kind, *board.vertices[idx])
+            case "City":
+                player.upgrade_settlement(*board.vertices[idx])
+            case "Knight":
+                x, y = board.positions[board.flat_tiles[idx]]
+                targets = player.use_card(self.usable_knight(player), board, x, y)
+                if targets:
+                    player.steal_random_resource(choice(targets))
+            case "Trade":
+                assert self.trades.execute(player), 6
+            case _:
+                raise Exception(f"{kind} is not an action of a player's own turn")
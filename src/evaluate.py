@@ -0,0 +1,146 @@
+"""
+Decide whether one bot beats another with as few games as possible, e.g. from `src/`:
+    python -m evaluate greedy random --seats 4 --margin 0.05 --confidence 0.95 --workers 4
+"""
+from __future__ import annotations
+import argparse
+from math import log
+from multiprocessing import Pool
+from statistics import NormalDist
+from typing import Dict, Generator, List, Tuple
+from simulate import BOARDS, run_game_args
+from bots import BOTS
+
+def wilson_interval(wins: int, games: int, confidence: float) -> Tuple[float, float]:
+    """Confidence interval of a win rate, which stays sensible for small samples and rates near 0 or 1"""
+    if games == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    rate = wins / games
+    centre = (rate + z * z / (2 * games)) / (1 + z * z / games)
+    spread = z / (1 + z * z / games) * (rate * (1 - rate) / games + z * z / (4 * games * games)) ** 0.5
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+class SequentialTest:
+    """
+    Sequential probability ratio test on how often bot A wins a decided game.
+    `share` is A's expected win rate if both bots were equally strong (its share of the seats);
+    the test stops once A is shown to win `margin` more often than that (decision "A"), or `margin` less ("B").
+    `error` bounds the probability of either wrong decision.
+    """
+
+    def __init__(self, share: float, margin: float = 0.05, error: float = 0.05):
+        low, high = max(share - margin, 1e-6), min(share + margin, 1 - 1e-6)
+        self.win_step = log(high / low)
+        self.loss_step = log((1 - high) / (1 - low))
+        self.lower = log(error / (1 - error))
+        self.upper = -self.lower
+        self.llr = 0.0
+
+    def add(self, a_won: bool):
+        self.llr += self.win_step if a_won else self.loss_step
+
+    @property
+    def decision(self) -> str | None:
+        if self.llr >= self.upper:
+            return "A"
+        if self.llr <= self.lower:
+            return "B"
+        return None
+
+class Evaluation:
+    """
+    Streams paired games between bots A and B: every seed is played once per distinct rotation of the lineup,
+    so both bots sit in every seat on the same board and development card stack, cancelling seat advantage.
+    """
+
+    def __init__(self, bot_a: str, bot_b: str, seats: int, margin: float, confidence: float):
+        self.bots = [bot_a, bot_b]
+        self.confidence = confidence
+        pattern = [e % 2 for e in range(seats)] # 0 is A, 1 is B
+        self.lineups: List[List[int]] = []
+        for rotation in range(seats):
+            lineup = pattern[rotation:] + pattern[:rotation]
+            if lineup not in self.lineups:
+                self.lineups.append(lineup)
+        self.test = SequentialTest(pattern.count(0) / seats, margin, 1 - confidence)
+        self.games = 0
+        self.unfinished = 0
+        self.seat_wins = [0 for _ in range(seats)]
+        self.bot_wins = [0, 0]
+
+    def jobs(self, seed: int, board: str, max_rounds: int, max_games: int) -> Generator[Tuple, None, None]:
+        for e in range(max_games):
+            lineup = self.lineups[e % len(self.lineups)]
+            yield seed + e // len(self.lineups), [self.bots[bot] for bot in lineup], board, max_rounds
+
+    def add(self, game_idx: int, result: Dict):
+        self.games += 1
+        if result["winner"] is None:
+            self.unfinished += 1
+            return
+        winning_bot = self.lineups[game_idx % len(self.lineups)][result["winner"]]
+        self.seat_wins[result["winner"]] += 1
+        self.bot_wins[winning_bot] += 1
+        self.test.add(winning_bot == 0)
+
+    def block_complete(self) -> bool:
+        return self.games % len(self.lineups) == 0
+
+    def report(self) -> str:
+        decision = {"A": self.bots[0], "B": self.bots[1], None: "undecided"}[self.test.decision]
+        lines = [f"{self.games} games, {self.unfinished} unfinished, decision: {decision} "
+            f"(log likelihood ratio {self.test.llr:.2f} in [{self.test.lower:.2f}, {self.test.upper:.2f}])"]
+        for name, wins in zip(self.bots, self.bot_wins):
+            low, high = wilson_interval(wins, self.games, self.confidence)
+            lines.append(f"{name}: {wins / max(self.games, 1):.1%} of games won [{low:.1%}, {high:.1%}]")
+        for seat, wins in enumerate(self.seat_wins):
+            low, high = wilson_interval(wins, self.games, self.confidence)
+            lines.append(f"seat {seat}: {wins / max(self.games, 1):.1%} [{low:.1%}, {high:.1%}]")
+        return "\n".join(lines)
+
+def evaluate(args: argparse.Namespace) -> Generator[Evaluation, None, None]:
+    """Play games until the test decides or `max_games` run out, yielding the evaluation after each block of rotations"""
+    evaluation = Evaluation(args.bot_a, args.bot_b, args.seats, args.margin, args.confidence)
+    jobs = evaluation.jobs(args.seed, args.board, args.max_rounds, args.max_games)
+    pool = Pool(args.workers) if args.workers > 1 else None
+    results = pool.imap(run_game_args, jobs) if pool else map(run_game_args, jobs)
+    try:
+        for e, result in enumerate(results):
+            evaluation.add(e, result)
+            if evaluation.block_complete():
+                yield evaluation
+                if evaluation.test.decision is not None:
+                    return
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="evaluate", description="Sequentially test whether bot A beats bot B")
+    parser.add_argument("bot_a", choices=sorted(BOTS))
+    parser.add_argument("bot_b", choices=sorted(BOTS))
+    parser.add_argument("--seats", type=int, default=4, help="players per game, seated alternately A, B, A, ...")
+    parser.add_argument("--margin", type=float, default=0.05, help="smallest win rate difference worth detecting")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--max-games", type=int, default=100000, help="stop undecided after this many games")
+    parser.add_argument("--board", default="standard", choices=sorted(BOARDS))
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first paired block")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--max-rounds", type=int, default=500, help="rounds after which a game is abandoned")
+    parser.add_argument("--report-every", type=int, default=100, help="games between progress lines")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None):
+    args = parse_args(argv)
+    evaluation, reported = None, 0
+    for evaluation in evaluate(args):
+        if evaluation.games - reported >= args.report_every:
+            reported = evaluation.games
+            print(evaluation.report().splitlines()[0], flush=True)
+    if evaluation is not None:
+        print(evaluation.report())
+
+if __name__ == "__main__":
+    main()
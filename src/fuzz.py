@@ -0,0 +1,285 @@
+"""
+Differential fuzzing of engine queries against slow reference implementations, e.g. from `src/`:
+    python -m fuzz --positions 10000 --seed 0
+Every mismatch is shrunk to a minimal position before it is reported.
+"""
+from __future__ import annotations
+import argparse
+import time
+from random import Random
+from typing import Callable, Dict, List, Set, Tuple
+from game import Game, Player, Resource, Road, SettlementOrCity, DevelopmentCard, Construction
+from encoder import ActionSpace
+
+class Position:
+    """
+    A game position as a replayable list of (kind, player, index) placements, so that it can be shrunk.
+    Replaying skips placements that no longer apply, e.g. a city whose settlement was removed.
+    """
+
+    def __init__(self, players: int, placements: List[Tuple[str, int, int]]):
+        self.players = players
+        self.placements = placements
+
+    def __repr__(self):
+        return f"Position({self.players}, {self.placements})"
+
+    def build(self) -> Game:
+        game = Game(players=[Player(str(e)) for e in range(self.players)], development_cards=[])
+        for placement in self.placements:
+            self.apply(game, placement)
+        return game
+
+    @staticmethod
+    def apply(game: Game, placement: Tuple[str, int, int]):
+        kind, player_idx, idx = placement
+        board = game.board
+        player = game.players[player_idx]
+        match kind:
+            case "settlement":
+                tile, slot_idx = board.vertices[idx]
+                if tile.construction_slots[slot_idx] is None:
+                    SettlementOrCity(player, tile, slot_idx)
+            case "city":
+                tile, slot_idx = board.vertices[idx]
+                settlement = tile.construction_slots[slot_idx]
+                if settlement is not None and settlement.owner is player and settlement.name == "Settlement":
+                    settlement.upgrade_to_city()
+            case "road":
+                tile, slot_idx = board.edges[idx]
+                if tile.road_slots[slot_idx] is None:
+                    Road(player, tile, slot_idx)
+            case "resource":
+                player.resources.append(Resource(idx))
+            case "robber":
+                if board.flat_tiles[idx] is not board.robber_tile:
+                    board.move_robber(player, *board.positions[board.flat_tiles[idx]])
+            case "knight":
+                player.development_cards.append(DevelopmentCard("knight", player, can_use=True))
+            case "card":
+                game.development_cards.append(DevelopmentCard("victory point"))
+
+class Reference:
+    """
+    Slow but plainly correct versions of engine queries, worked out on the board's vertex and edge numbering
+    instead of tile slots: an edge joins two vertices, and everything else follows from that graph.
+    """
+
+    def __init__(self, game: Game):
+        self.game = game
+        board = game.board
+        self.ends: List[Tuple[int, int]] = [(board.vertex_ids[(tile, idx)], board.vertex_ids[(tile, (idx + 1) % 6)])
+            for tile, idx in board.edges]
+        self.incident: List[List[int]] = [[] for _ in board.vertices]
+        for edge, (start, end) in enumerate(self.ends):
+            self.incident[start].append(edge)
+            self.incident[end].append(edge)
+
+    def road(self, edge: int) -> Road | None:
+        tile, idx = self.game.board.edges[edge]
+        return tile.road_slots[idx]
+
+    def construction(self, vertex: int) -> Construction | None:
+        tile, idx = self.game.board.vertices[vertex]
+        return tile.construction_slots[idx]
+
+    def vertex_roads(self, vertex: int) -> Set[int]:
+        return set(id(self.road(edge)) for edge in self.incident[vertex] if self.road(edge) is not None)
+
+    def adjacent_roads(self, edge: int) -> Set[int]:
+        return set(id(self.road(other)) for vertex in self.ends[edge] for other in self.incident[vertex]
+            if other != edge and self.road(other) is not None)
+
+    def neighbour_vertices(self, vertex: int) -> List[int]:
+        return [end if start == vertex else start for start, end in (self.ends[edge] for edge in self.incident[vertex])]
+
+    def adjacent_settlements(self, vertex: int) -> Set[int]:
+        return set(id(self.construction(other)) for other in self.neighbour_vertices(vertex)
+            if self.construction(other) is not None)
+
+    def longest_road(self, player: Player) -> int:
+        """Try every trail from every vertex, never reusing an edge"""
+        edges = set(edge for edge in range(len(self.ends)) if self.road(edge) is not None
+            and self.road(edge).owner is player)
+        def walk(vertex: int, used: Set[int]) -> int:
+            return max((1 + walk(self.ends[edge][self.ends[edge][0] == vertex], used | {edge})
+                for edge in self.incident[vertex] if edge in edges and edge not in used), default=0)
+        return max((walk(vertex, set()) for edge in edges for vertex in self.ends[edge]), default=0)
+
+    def collected(self, player: Player, number: int) -> List[Resource]:
+        """One resource per producing tile next to any of the player's settlements or cities"""
+        board = self.game.board
+        tiles = set()
+        for vertex, (tile, idx) in enumerate(board.vertices):
+            construction = self.construction(vertex)
+            if construction is not None and construction.owner is player:
+                tiles.update(alias for alias, alias_idx in board.vertex_ids if board.vertex_ids[(alias, alias_idx)] == vertex)
+        return sorted((tile.resource for tile in tiles if tile.number == number and not tile.has_robber),
+            key=lambda resource: resource.value)
+
+    def legal_actions(self, player: Player, actions: ActionSpace) -> Set[int]:
+        game, board = self.game, self.game.board
+        def affords(item: str) -> bool:
+            return all(player.resources.count(resource) >= count
+                for resource, count in Construction.construction_dict[item].items())
+        def owns(item: Construction | None) -> bool:
+            return item is not None and item.owner is player
+        legal = {0}
+        if game.development_cards and affords("Development Card"):
+            legal.add(1)
+        for edge, ends in enumerate(self.ends):
+            if affords("Road") and self.road(edge) is None and (any(owns(self.construction(vertex)) for vertex in ends)
+                    or any(owns(self.road(other)) for vertex in ends for other in self.incident[vertex])):
+                legal.add(actions.road_offset + edge)
+        for vertex in range(len(board.vertices)):
+            construction = self.construction(vertex)
+            if affords("Settlement") and construction is None and \
+                    all(self.construction(other) is None for other in self.neighbour_vertices(vertex)) and \
+                    any(owns(self.road(edge)) for edge in self.incident[vertex]):
+                legal.add(actions.settlement_offset + vertex)
+            if affords("City") and owns(construction) and construction.name == "Settlement":
+                legal.add(actions.city_offset + vertex)
+        if any(card.card_type == "knight" and card.can_use for card in player.development_cards):
+            legal.update(actions.knight_offset + e for e, tile in enumerate(board.flat_tiles) if not tile.has_robber)
+        return legal
+
+def check_vertex_roads(game: Game, reference: Reference) -> str | None:
+    for (tile, idx), vertex in game.board.vertex_ids.items():
+        if set(id(road) for road in tile.vertex_roads(idx)) != reference.vertex_roads(vertex):
+            return f"vertex_roads differs at {tile} vertex {idx}"
+
+def check_adjacent_roads(game: Game, reference: Reference) -> str | None:
+    for (tile, idx), edge in game.board.edge_ids.items():
+        if set(id(road) for road in tile.adjacent_roads(idx)) != reference.adjacent_roads(edge):
+            return f"adjacent_roads differs at {tile} edge {idx}"
+
+def check_adjacent_settlements(game: Game, reference: Reference) -> str | None:
+    for (tile, idx), vertex in game.board.vertex_ids.items():
+        if set(id(settlement) for settlement in tile.adjacent_settlements(idx)) != reference.adjacent_settlements(vertex):
+            return f"adjacent_settlements differs at {tile} vertex {idx}"
+
+def check_longest_road(game: Game, reference: Reference) -> str | None:
+    for player in game.players:
+        if player.longest_road != reference.longest_road(player):
+            return f"longest_road of player {player} is {player.longest_road}, expected {reference.longest_road(player)}"
+
+def check_collect_resources(game: Game, reference: Reference) -> str | None:
+    for player in game.players:
+        hand = player.resources
+        for number in range(2, 13):
+            player.resources = []
+            player.collect_resources(number)
+            collected = sorted(player.resources, key=lambda resource: resource.value)
+            player.resources = hand
+            if collected != reference.collected(player, number):
+                return f"collect_resources of player {player} on {number} gives {collected}"
+
+def check_legal_actions(game: Game, reference: Reference) -> str | None:
+    actions = ActionSpace(game)
+    for player in game.players:
+        mask = actions.legal_mask(player)
+        found = set(e for e, legal in enumerate(mask) if legal)
+        expected = reference.legal_actions(player, actions)
+        if found != expected:
+            return f"legal actions of player {player}: extra {sorted(found - expected)}, missing {sorted(expected - found)}"
+
+CHECKS: Dict[str, Callable[[Game, Reference], str | None]] = {
+    "vertex_roads": check_vertex_roads,
+    "adjacent_roads": check_adjacent_roads,
+    "adjacent_settlements": check_adjacent_settlements,
+    "longest_road": check_longest_road,
+    "collect_resources": check_collect_resources,
+    "legal_actions": check_legal_actions
+}
+
+def random_position(rnd: Random, placements: int = 40) -> Position:
+    """Grow a position by legal placements: spaced settlements, roads joined to their owner's network, and so on"""
+    players = rnd.randint(2, 4)
+    position = Position(players, [])
+    game = position.build()
+    reference = Reference(game)
+    board = game.board
+    for _ in range(placements):
+        player_idx = rnd.randrange(players)
+        player = game.players[player_idx]
+        roll = rnd.random()
+        if roll < 0.2:
+            vertex = rnd.randrange(len(board.vertices))
+            if reference.construction(vertex) is None and all(reference.construction(other) is None
+                    for other in reference.neighbour_vertices(vertex)):
+                placement = ("settlement", player_idx, vertex)
+            else:
+                continue
+        elif roll < 0.7:
+            network = set(vertex for vertex in range(len(board.vertices))
+                if reference.construction(vertex) is not None and reference.construction(vertex).owner is player)
+            network.update(vertex for edge, ends in enumerate(reference.ends) if reference.road(edge) is not None
+                and reference.road(edge).owner is player for vertex in ends)
+            options = [edge for vertex in network for edge in reference.incident[vertex] if reference.road(edge) is None]
+            if not options:
+                continue
+            placement = ("road", player_idx, rnd.choice(options))
+        elif roll < 0.8:
+            placement = ("city", player_idx, rnd.randrange(len(board.vertices)))
+        elif roll < 0.95:
+            placement = ("resource", player_idx, rnd.randint(1, 5))
+        else:
+            placement = (rnd.choice(["robber", "knight", "card"]), player_idx, rnd.randrange(len(board.flat_tiles)))
+        position.placements.append(placement)
+        Position.apply(game, placement)
+    return position
+
+def failure(position: Position, check: Callable[[Game, Reference], str | None]) -> str | None:
+    game = position.build()
+    return check(game, Reference(game))
+
+def shrink(position: Position, check: Callable[[Game, Reference], str | None]) -> Position:
+    """Drop placements, in halves and then one at a time, for as long as the check keeps failing"""
+    placements = position.placements
+    chunk = max(len(placements) // 2, 1)
+    while chunk >= 1:
+        e, shrunk = 0, False
+        while e < len(placements):
+            candidate = placements[:e] + placements[e + chunk:]
+            if failure(Position(position.players, candidate), check) is not None:
+                placements, shrunk = candidate, True
+            else:
+                e += chunk
+        if not shrunk:
+            chunk //= 2
+    return Position(position.players, placements)
+
+def fuzz(positions: int, seed: int = 0, checks: Dict[str, Callable] | None = None,
+        placements: int = 40) -> List[Tuple[str, Position, str]]:
+    """Check `positions` random positions; return (check name, shrunk position, message) for each failing check"""
+    checks = CHECKS if checks is None else checks
+    rnd = Random(seed)
+    failures = []
+    failed = set()
+    for _ in range(positions):
+        position = random_position(rnd, placements)
+        game = position.build()
+        reference = Reference(game)
+        for name, check in checks.items():
+            if name not in failed and check(game, reference) is not None:
+                minimal = shrink(position, check)
+                failures.append((name, minimal, failure(minimal, check)))
+                failed.add(name)
+    return failures
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(prog="fuzz", description="Compare engine queries with reference implementations")
+    parser.add_argument("--positions", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--placements", type=int, default=40, help="placements tried per random position")
+    parser.add_argument("--check", action="append", choices=sorted(CHECKS), help="only run these checks")
+    args = parser.parse_args(argv)
+    checks = {name: CHECKS[name] for name in args.check} if args.check else CHECKS
+    start = time.perf_counter()
+    failures = fuzz(args.positions, args.seed, checks, args.placements)
+    print(f"{args.positions} positions in {time.perf_counter() - start:.1f}s, {len(failures)} failing checks")
+    for name, position, message in failures:
+        print(f"{name}: {message}\n    minimal {position}")
+
+if __name__ == "__main__":
+    main()
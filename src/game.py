@@ -20,8 +20,17 @@ class Player:
         self.resources: List[Resource] = []
         self.development_cards: List[DevelopmentCard] = []
         self.occupied_tiles: Set[Tile] = set()
-        self.victory_points = 0
         self.army_count = 0
+        self.played_card = False # a development card other than a victory point this turn: only one is allowed
+        # points are only written by a ledger, fed by events: a player outside a `Game` keeps its own
+        self.ledger = VictoryPointLedger([self])
+        # callbacks for public game events, shared by every player of a `Game`
+        self.listeners: List[Callable] = [self.ledger.on_event]
+
+    @property
+    def victory_points(self) -> int:
+        """Public victory points, as recorded by the ledger"""
+        return self.ledger.public[self.ledger.index[self]]
 
     @property
     def controlled_tiles(self):
@@ -49,88 +58,132 @@ class Player:
     def __repr__(self):
         return self.name
 
+    def emit(self, event: str, *args):
+        """Notify listeners of an event caused by this player"""
+        for listener in self.listeners:
+            listener(event, self, *args)
+
     def build(self, item: str, tile: Tile | None = None, slot_idx: int | None = None, 
         stack: List[DevelopmentCard] | None = None, costs_resources=True):
         if costs_resources:
             assert Construction.has_resources_for(self, item), 0
             for resource in Construction.construction_dict[item]: 
                 self.resources.remove(resource)
+            self.emit("spend", item)
         match item:
             case "Road":
-                # TODO: this looks patently ridiculous and it's time to abstract it out to a function
-                assert any(settlement.owner is self 
-                    for settlement in tile.adjacent_settlements(slot_idx)) or \
-                    any(road.owner is self for road in tile.adjacent_roads(slot_idx)) or \
-                    (tile.construction_slots[slot_idx] is not None and tile.construction_slots[slot_idx].owner \
-                    is self), 1
+                assert self.road_is_connected(tile, slot_idx), 1
                 Road(self, tile, slot_idx)
             case "Settlement":
-                assert any(road.owner is self for road in tile.adjacent_roads(slot_idx)), 2
+                assert any(road.owner is self for road in tile.vertex_roads(slot_idx)), 2
                 assert not tile.adjacent_settlements(slot_idx), 3
                 SettlementOrCity(self, tile, slot_idx)
             case "Development Card": 
-                self.development_cards.append(stack.pop())
+                card = stack.pop()
+                card.owner = self
+                self.development_cards.append(card)
+                self.emit("buy card", card)
             case "City": 
                 raise Exception("Cities must be upgraded from Settlements, not built directly")
             case _: 
                 raise Exception("Invalid item")
 
+    def road_is_connected(self, tile: Tile, slot_idx: int) -> bool:
+        """Check if a road on a tile edge would join one of the player's settlements or roads"""
+        return any(construction is not None and construction.owner is self 
+                for construction in (tile.construction_slots[slot_idx], tile.construction_slots[(slot_idx+1)%6])) or \
+            any(road.owner is self for road in tile.adjacent_roads(slot_idx))
+
+    def can_place(self, item: str, tile: Tile, slot_idx: int) -> bool:
+        """Non-raising placement check for `build`/`upgrade_settlement` (resources are not considered)"""
+        match item:
+            case "Road":
+                return tile.road_slots[slot_idx] is None and self.road_is_connected(tile, slot_idx)
+            case "Settlement":
+                return tile.construction_slots[slot_idx] is None and \
+                    any(road.owner is self for road in tile.vertex_roads(slot_idx)) and \
+                    not tile.adjacent_settlements(slot_idx)
+            case "City":
+                settlement = tile.construction_slots[slot_idx]
+                return settlement is not None and settlement.owner is self and settlement.name == "Settlement"
+            case _:
+                return False
+
+    def upgrade_settlement(self, tile: Tile, slot_idx: int, costs_resources=True):
+        """Pay for and upgrade one of the player's settlements to a city"""
+        settlement = tile.construction_slots[slot_idx]
+        assert settlement is not None and settlement.owner is self and settlement.name == "Settlement", 4
+        if costs_resources:
+            assert Construction.has_resources_for(self, "City"), 0
+            for resource, count in Construction.construction_dict["City"].items():
+                for _ in range(count):
+                    self.resources.remove(resource)
+            self.emit("spend", "City")
+        settlement.upgrade_to_city()
+
     def use_card(self, development_card: DevelopmentCard, *args):
         assert development_card in self.development_cards
         return_val = development_card.use(*args)
         self.development_cards.remove(development_card)
+        if development_card.card_type != "victory point":
+            self.played_card = True
+        self.emit("play card", development_card)
         if return_val:
             return return_val
 
+    def discard(self, resource: Resource):
+        """Return a resource to the bank, as owed when a 7 is rolled"""
+        self.resources.remove(resource)
+        self.emit("discard", resource)
+
+    def trade(self, partner: Player, give: List[Resource], get: List[Resource]):
+        """Swap resources with another player: `give` goes to the partner, `get` comes back"""
+        for resources, owner in ((give, self), (get, partner)):
+            assert all(owner.resources.count(resource) >= resources.count(resource) for resource in resources), 6
+        for resource in give:
+            self.resources.remove(resource)
+            partner.resources.append(resource)
+        for resource in get:
+            partner.resources.remove(resource)
+            self.resources.append(resource)
+        self.emit("trade", partner, give, get)
+
     def steal_random_resource(self, victim: Player):
         if len(victim.resources) == 0:
             return
         random_resource = choice(victim.resources)
         self.resources.append(random_resource)
         victim.resources.remove(random_resource)
+        self.emit("steal", victim, random_resource)
 
     def collect_resources(self, number: int):
-        self.resources.extend(tile.resource for tile in self.controlled_tiles if tile.check_proc(number))
+        # sorted, as tiles come from a set: a seeded game must deal the same hand order, which random steals draw from
+        collected = sorted((tile.resource for tile in self.controlled_tiles if tile.check_proc(number)),
+            key=lambda resource: resource.value)
+        if collected:
+            self.resources.extend(collected)
+            self.emit("collect", collected)
 
     @property
     def longest_road(self):
-        def recurse_path(current_road: Road, checked_roads: List[Road], forbidden_roads: List[Road], current_length: int):
-            checked_roads.append(current_road)
-            # forbidden roads are roads that the last road could see, which means they are behind us
-            available_roads = [road for road in current_road.adjacent_roads if road not in checked_roads 
-                and road not in forbidden_roads]
-            if available_roads:
-                return max(recurse_path(path, checked_roads, available_roads, current_length+1) for path in available_roads)
-            else:
-                return current_length, checked_roads
-        
-        if not self.roads:
-            return 0
-        checked_roads = []
-        longest = 1
-        # keep checking until there are no roads to visit: this ensures every path is visited once
-        while remaining := [road for road in self.roads if road not in checked_roads]:
-            starting_road = remaining[0]
-            checked_roads.append(starting_road)
-            path_res = {}
-            for path in starting_road.adjacent_roads:
-                # we might have visited the road during iteration
-                if path not in checked_roads:
-                    path_length, checked_roads = recurse_path(path, checked_roads, starting_road.adjacent_roads, 2)
-                    path_res[str(path)] = path_length
-            if not path_res:
-                continue
-            longest_paths = sorted(path_res.items(), key=lambda x: x[1], reverse=True)[0:2]
-            # if the starting road isn't at an edge, it gets counted twice so this needs to be adjusted for
-            total = sum(i[1] for i in longest_paths) - (len(longest_paths) - 1)
-            get_road = [r for r in starting_road.adjacent_roads if str(r) == longest_paths[0][0]][0]
-            if len(longest_paths) > 1:
-                get_second_road = [r for r in starting_road.adjacent_roads if str(r) == longest_paths[1][0]][0]
-                # if the first road can see the second road, then the starting road is sticking out in a fork (not to be included)
-                if get_second_road in get_road.adjacent_roads:
-                    total -= 1
-            longest = max(longest, total)
-        return longest
+        """Length of the longest trail through the player's roads: roads may meet again, but none is counted twice"""
+        roads_at: Dict[Tuple[Tile, int], List[Road]] = {}
+        ends = {road: road.vertices for road in self.roads} # looked up once, not at every step of the walk
+        for road, vertices in ends.items():
+            for vertex in vertices:
+                roads_at.setdefault(vertex, []).append(road)
+
+        def walk(vertex: Tuple[Tile, int], used: Set[Road]) -> int:
+            longest = 0
+            for road in roads_at[vertex]:
+                if road not in used:
+                    used.add(road)
+                    start, end = ends[road]
+                    longest = max(longest, 1 + walk(end if start == vertex else start, used))
+                    used.remove(road)
+            return longest
+
+        return max((walk(vertex, set()) for vertex in roads_at), default=0)
 
 class Harbour:
     """A trading port that can be used for better deals"""
@@ -187,9 +240,13 @@ class Tile:
         Determine, given an edge of the tile, what other tiles are intersected.
         Returned clockwise, includes Nonetype values
         """
-        if edge_idx == 0:
-            return [self.neighbours[-1], self.neighbours[0], self.neighbours[1]]
-        return self.neighbours[edge_idx-1:edge_idx+2]
+        return [self.neighbours[edge_idx-1], self.neighbours[edge_idx], self.neighbours[(edge_idx+1)%6]]
+
+    def vertex_key(self, vertex_idx: int) -> Tuple[Tile, int]:
+        """The same (tile, slot index) locator for a vertex whichever of its tiles it is looked up from"""
+        intersection = [self] + self.vertex_neighbours(vertex_idx)
+        return min(((tile, idx) for tile, idx in self.slot_idx_gen(intersection, vertex_idx) if tile is not None),
+            key=lambda locator: (id(locator[0]), locator[1]))
 
     def adjacent_roads(self, edge_idx: int) -> List[Road]:
         """
@@ -209,6 +266,18 @@ class Tile:
                     roads.append(road_slot)
         return roads
 
+    def vertex_roads(self, vertex_idx: int) -> List[Road]:
+        """
+        Return a list of all Roads meeting at a tile vertex: the two edges of this tile either side of it, 
+        and the edge between the two other tiles at the vertex (found on whichever of them is not shoreline)
+        """
+        slots = [self.road_slots[vertex_idx-1], self.road_slots[vertex_idx]]
+        if self.neighbours[vertex_idx] is not None:
+            slots.append(self.neighbours[vertex_idx].road_slots[(vertex_idx+4)%6])
+        elif self.neighbours[vertex_idx-1] is not None:
+            slots.append(self.neighbours[vertex_idx-1].road_slots[(vertex_idx+1)%6])
+        return [road for road in slots if road is not None]
+
     def adjacent_settlements(self, vertex_idx: int) -> List[SettlementOrCity]:
         """
         Return a list of all Settlements (or Cities) adjacent to a tile vertex
@@ -286,6 +355,7 @@ class Road(Construction):
             inverted_slot_idx = (slot_idx + 3) % 6
             opposite_tile.road_slots[inverted_slot_idx] = self
             self.owner.occupied_tiles.add(opposite_tile)
+        self.owner.emit("road", self)
 
     def __repr__(self):
         return f"{super().__repr__()} at {self.locator}"
@@ -294,6 +364,12 @@ class Road(Construction):
     def adjacent_roads(self):
         return self.locator[0].adjacent_roads(self.locator[1])
 
+    @property
+    def vertices(self) -> Tuple[Tuple[Tile, int], Tuple[Tile, int]]:
+        """The vertices at either end of the road, as keys shared by every tile meeting there"""
+        tile, slot_idx = self.locator
+        return tile.vertex_key(slot_idx), tile.vertex_key((slot_idx + 1) % 6)
+
     def road_is(self, road: Road):
         """
         """
@@ -311,11 +387,11 @@ class SettlementOrCity(Construction):
         self.tiles: List[Tile] = [tile for tile in self.tiles if tile is not None] # once the loop has completed eliminate NoneTypes
         super().__init__("Settlement", owner)
         self.owner.occupied_tiles.update(self.tiles)
-        self.owner.victory_points += 1
+        self.owner.emit("settlement", self)
 
     def upgrade_to_city(self):
         self.name = "City"
-        self.owner.victory_points += 1
+        self.owner.emit("city", self)
 
 class DevelopmentCard(Construction):
     """Mystery card to give players an edge"""
@@ -374,7 +450,7 @@ class DevelopmentCard(Construction):
         return target_players
 
     def use_victory_point(self):
-        self.owner.victory_points += 1
+        self.owner.emit("victory point")
 
     def use_road_building(self, tiles: Tuple[Tile, Tile], slots: Tuple[int, int]):
         for tile, slot in zip(tiles, slots):
@@ -382,11 +458,14 @@ class DevelopmentCard(Construction):
 
     def use_year_of_plenty(self, resources: Tuple[Resource, Resource]):
         self.owner.resources.extend(resources)
+        self.owner.emit("year of plenty", resources)
 
     def use_monopoly(self, players: List[Player], resource: Resource):
-        self.owner.resources.extend(res for player in players for res in player.resources if res == resource)
+        taken = [(player, player.resources.count(resource)) for player in players]
+        self.owner.resources.extend(resource for _, count in taken for _ in range(count))
         for player in players:
             player.resources = [res for res in player.resources if res != resource]
+        self.owner.emit("monopoly", resource, taken)
 
 class Board:
     """The board represents the 2d playing space of Catan"""
@@ -435,30 +514,84 @@ class Board:
         ]
 
         self.robber_tile = [tile for layer in self.tiles for tile in layer if tile.has_robber][0]
+        coordinates = kwargs.get("coordinates") or self.centred_coordinates([len(layer) for layer in self.tiles])
+        self.coordinates: Dict[Tile, Tuple[int, int]] = {tile: coordinate 
+            for layer, coordinate_layer in zip(self.tiles, coordinates) for tile, coordinate in zip(layer, coordinate_layer)}
+        self.link_tiles()
+        self.index_slots()
+
+    # axial (q, r) offsets of the neighbour across each tile edge, starting north-east and going clockwise
+    directions = [(1, -1), (1, 0), (0, 1), (-1, 1), (-1, 0), (0, -1)]
+
+    standard_terrains = ["Desert"] + ["Forest", "Pasture", "Fields"] * 4 + ["Hills", "Mountains"] * 3
+    standard_numbers = [2, 12] + [3, 4, 5, 6, 8, 9, 10, 11] * 2
+
+    @staticmethod
+    def centred_coordinates(row_lengths: List[int]) -> List[List[Tuple[int, int]]]:
+        """
+        Axial coordinates for rows of tiles centred on each other, one row per r value.
+        Rows that differ in length by one (a hexagon) line up exactly; equal rows form a staggered rectangle.
+        """
+        return [[(q, r) for q in range(-((length - 1 + r) // 2), -((length - 1 + r) // 2) + length)]
+            for r, length in enumerate(row_lengths)]
 
-        for e, layer in enumerate(self.tiles):
-            for f, tile in enumerate(layer):
-                if f + 1 < len(layer): # link horizontal neighbour
-                    east_tile = layer[f+1]
-                    tile.neighbours[1] = east_tile
-                    east_tile.neighbours[4] = tile
-                if e < 4: # link vertical neighbour(s)
-                    if e < 2:
-                        south_west_tile = self.tiles[e+1][f]
-                        tile.neighbours[3] = south_west_tile
-                        south_west_tile.neighbours[0] = tile
-                        south_east_tile = self.tiles[e+1][f+1]
-                        tile.neighbours[2] = south_east_tile
-                        south_east_tile.neighbours[5] = tile
-                    else:
-                        if f > 0:
-                            south_west_tile = self.tiles[e+1][f-1]
-                            tile.neighbours[3] = south_west_tile
-                            south_west_tile.neighbours[0] = tile
-                        if f + 1 < len(layer):
-                            south_east_tile = self.tiles[e+1][f]
-                            tile.neighbours[2] = south_east_tile
-                            south_east_tile.neighbours[5] = tile
+    @staticmethod
+    def hexagon_layout(shortest: int = 3, longest: int = 5) -> List[List[Tuple[int, int]]]:
+        """Coordinates of a hexagonal board, e.g. (3, 5) for the base game and (3, 6) for the 5-6 player extension"""
+        widening = list(range(shortest, longest))
+        return Board.centred_coordinates(widening + [longest] + widening[::-1])
+
+    @classmethod
+    def generate(cls, coordinates: List[List[Tuple[int, int]]], harbour_count: int | None = None) -> Board:
+        """
+        Build a random board of any shape from rows of axial coordinates in O(tiles).
+        Terrains and numbers repeat the base game's distribution, and harbours are spaced evenly around the coast.
+        """
+        tile_count = sum(len(layer) for layer in coordinates)
+        terrains = sample(cls.standard_terrains * (tile_count // len(cls.standard_terrains) + 1), k=tile_count)
+        if "Desert" not in terrains: # the robber has to start somewhere
+            terrains[randint(0, tile_count - 1)] = "Desert"
+        numbers = sample(cls.standard_numbers * (tile_count // len(cls.standard_numbers) + 1), k=tile_count)
+        tiles = iter(Tile(terrain, 0 if terrain == "Desert" else number) for terrain, number in zip(terrains, numbers))
+        rows = [[next(tiles) for _ in layer] for layer in coordinates]
+        next(tile for layer in rows for tile in layer if tile.terrain == "Desert").has_robber = True
+        board = cls(Tiles=rows, coordinates=coordinates)
+        coast = board.coastline()
+        harbour_count = len(coast) * 3 // 10 if harbour_count is None else harbour_count
+        harbour_types = [None] * 4 + list(Resource)
+        harbours = sample(harbour_types * (harbour_count // len(harbour_types) + 1), k=harbour_count)
+        for e, resource in enumerate(harbours):
+            tile, edge_idx = coast[e * len(coast) // harbour_count]
+            harbour = Harbour(resource)
+            tile.harbour_slots[edge_idx] = harbour
+            tile.harbour_slots[(edge_idx + 1) % 6] = harbour
+        board.index_slots()
+        return board
+
+    def link_tiles(self):
+        """Link every tile to its neighbours using a lookup on axial coordinates, in O(tiles)"""
+        grid = {coordinate: tile for tile, coordinate in self.coordinates.items()}
+        for tile, (q, r) in self.coordinates.items():
+            tile.neighbours = [grid.get((q + dq, r + dr)) for dq, dr in self.directions]
+
+    def coastline(self) -> List[Tuple[Tile, int]]:
+        """
+        Return the (tile, edge index) of every edge on the outer coast, in clockwise order.
+        Walks the perimeter from the first tile, pivoting around each vertex onto the next tile along the shore.
+        """
+        start_tile = self.tiles[0][0]
+        tile, vertex_idx = start_tile, 0
+        while tile.neighbours[vertex_idx] is not None:
+            vertex_idx += 1
+        start = (tile, vertex_idx)
+        coast = []
+        while True:
+            while tile.neighbours[vertex_idx] is not None:
+                tile, vertex_idx = tile.neighbours[vertex_idx], (vertex_idx + 4) % 6
+            if coast and (tile, vertex_idx) == start:
+                return coast
+            coast.append((tile, vertex_idx))
+            vertex_idx = (vertex_idx + 1) % 6
 
     def __iter__(self):
         return iter(self.tiles)
@@ -469,6 +602,33 @@ class Board:
     def tile_at(self, x: int, y: int):
         return self.tiles[y][x]
 
+    def index_slots(self):
+        """
+        Number every tile, vertex and edge of the linked board.
+        Slots are shared between up to three tiles, so each vertex/edge gets one canonical (tile, slot) locator 
+        in `vertices`/`edges`, while `vertex_ids`/`edge_ids` map every alias of it to the same index.
+        """
+        self.flat_tiles: List[Tile] = [tile for layer in self.tiles for tile in layer]
+        self.positions: Dict[Tile, Tuple[int, int]] = {tile: (x, y) 
+            for y, layer in enumerate(self.tiles) for x, tile in enumerate(layer)}
+        self.vertices: List[Tuple[Tile, int]] = []
+        self.edges: List[Tuple[Tile, int]] = []
+        self.vertex_ids: Dict[Tuple[Tile, int], int] = {}
+        self.edge_ids: Dict[Tuple[Tile, int], int] = {}
+        for tile in self.flat_tiles:
+            for idx in range(6):
+                if (tile, idx) not in self.vertex_ids:
+                    intersection = [tile] + tile.vertex_neighbours(idx)
+                    for alias in Tile.slot_idx_gen(intersection, idx):
+                        if alias[0] is not None:
+                            self.vertex_ids[alias] = len(self.vertices)
+                    self.vertices.append((tile, idx))
+                if (tile, idx) not in self.edge_ids:
+                    self.edge_ids[(tile, idx)] = len(self.edges)
+                    if tile.neighbours[idx] is not None:
+                        self.edge_ids[(tile.neighbours[idx], (idx + 3) % 6)] = len(self.edges)
+                    self.edges.append((tile, idx))
+
     def init_player_position(self, player: Player, settlements: List[Tuple[int, int, int]], 
             roads: List[Tuple[int, int, int]]):
         """Choose starting locations from a global board of tiles"""
@@ -486,8 +646,67 @@ class Board:
         self.robber_tile.has_robber = False
         tile.has_robber = True
         self.robber_tile = tile
+        player.emit("robber", tile)
         return list(set(slot.owner for slot in tile.construction_slots if slot is not None and slot.owner is not player))
 
+class VictoryPointLedger:
+    """
+    Event-driven record of where every player's victory points come from, and the only place points are written.
+    `Player.victory_points` reads public points; hidden points are unplayed victory point cards, which
+    count towards winning from the moment they are bought. The winner is recorded, and a "win" event 
+    emitted, the moment a player's total reaches the target.
+    """
+
+    sources = ["Settlement", "City", "Largest Army", "Longest Road", "Victory Point Card"]
+
+    def __init__(self, players: List[Player], target: int = 10):
+        self.target = target
+        self.index: Dict[Player, int] = {player: e for e, player in enumerate(players)}
+        self.public = [0 for _ in players]
+        self.hidden = [0 for _ in players]
+        self.contributions: List[Dict[str, int]] = [dict.fromkeys(self.sources, 0) for _ in players]
+        self.winner: Player | None = None
+
+    def total(self, player: Player) -> int:
+        i = self.index[player]
+        return self.public[i] + self.hidden[i]
+
+    def record(self, player: Player, source: str, points: int, hidden=False):
+        i = self.index[player]
+        self.contributions[i][source] += points
+        if hidden:
+            self.hidden[i] += points
+        else:
+            self.public[i] += points
+        if points > 0 and self.winner is None and self.public[i] + self.hidden[i] >= self.target:
+            self.winner = player
+            player.emit("win")
+
+    def on_event(self, event: str, player: Player, *args):
+        i = self.index[player]
+        match event:
+            case "settlement":
+                self.record(player, "Settlement", 1)
+            case "city":
+                # a city is worth 2, replacing its settlement's point
+                self.contributions[i]["Settlement"] -= 1
+                self.contributions[i]["City"] += 1
+                self.record(player, "City", 1)
+            case "buy card":
+                if args[0].card_type == "victory point":
+                    self.record(player, "Victory Point Card", 1, hidden=True)
+            case "victory point": # a played card moves from hidden to public
+                if self.hidden[i]:
+                    self.hidden[i] -= 1
+                    self.public[i] += 1
+                else:
+                    self.record(player, "Victory Point Card", 1)
+            case "largest army" | "longest road":
+                source = event.title()
+                if args[0] is not None:
+                    self.record(args[0], source, -2)
+                self.record(player, source, 2)
+
 class Game:
     """Class to encapsulate all global state in a game of Catan"""
 
@@ -500,16 +719,23 @@ class Game:
     
     def __init__(self, **kwargs):
         self.round = 1
-        self.board = Board(board=kwargs.get("board"))
+        self.board: Board = kwargs.get("board") or Board()
         self.players: List[Player] = kwargs.get("players", [Player(name) for name in self.default_names])
+        self.listeners: List[Callable] = []
+        self.ledger = VictoryPointLedger(self.players, kwargs.get("victory_point_target", 10))
+        self.listeners.append(self.ledger.on_event)
+        for player in self.players:
+            player.listeners = self.listeners
+            player.ledger = self.ledger
         self.current_actor = self.players[0]
         self.development_cards = kwargs.get("development_cards", DevelopmentCard.default_card_stack())
         self.player_with_largest_army: Player | None = None
         self.player_with_longest_road: Player | None = None
 
     def __repr__(self):
-        sorted_players = sorted(self.players, key=lambda x: x.victory_points, reverse=True)
-        return ", ".join(f"{player}: {player.victory_points}" for player in sorted_players)
+        public = self.ledger.public
+        order = sorted(range(len(self.players)), key=lambda e: public[e], reverse=True)
+        return ", ".join(f"{self.players[e]}: {public[e]}" for e in order)
 
     @staticmethod
     def dice_roll():
@@ -522,18 +748,16 @@ class Game:
     def check_largest_army(self):
         to_beat = self.player_with_largest_army.army_count if self.player_with_largest_army is not None else 2
         if self.current_actor.army_count > to_beat:
-            if self.player_with_largest_army is not None:
-                self.player_with_largest_army.victory_points -= 2
-            self.current_actor.victory_points += 2
+            previous = self.player_with_largest_army
             self.player_with_largest_army = self.current_actor
+            self.current_actor.emit("largest army", previous)
 
     def check_longest_road(self):
         to_beat = self.player_with_longest_road.longest_road if self.player_with_longest_road is not None else 2
         if self.current_actor.longest_road > to_beat:
-            if self.player_with_longest_road is not None:
-                self.player_with_longest_road.victory_points -= 2
-            self.current_actor.victory_points += 2
+            previous = self.player_with_longest_road
             self.player_with_longest_road = self.current_actor
+            self.current_actor.emit("longest road", previous)
 
     def next_turn(self):
         actor_idx = self.players.index(self.current_actor)
@@ -541,25 +765,122 @@ class Game:
 
     def is_winner(self) -> bool:
         """
-        Return True if there is a winner.
+        Return True if there is a winner, as recorded by the ledger when the target was reached.
         Used as an exit clause for `game_wrapper`.
         """
-        return self.current_actor.victory_points >= 10
+        return self.ledger.winner is not None
 
-    def game_wrapper(self, option: Callable) -> Player:
+    def setup(self, place: Callable):
+        """
+        Run the starting placement in snake order: `place` is called on each player forwards, then backwards, 
+        and returns the settlement it placed. Each player's second settlement collects its adjacent resources.
+        """
+        for e, player in enumerate(self.players + self.players[::-1]):
+            settlement = place(player)
+            if e >= len(self.players):
+                self.collect_starting_resources(player, settlement)
+
+    @staticmethod
+    def collect_starting_resources(player: Player, settlement: SettlementOrCity):
+        """Give a player one resource from each tile around its second starting settlement"""
+        collected = [tile.resource for tile in settlement.tiles if tile.resource is not None]
+        if collected:
+            player.resources.extend(collected)
+            player.emit("collect", collected)
+
+    def game_wrapper(self, option: Callable, max_rounds: int | None = None) -> Player | None:
         """
         This wrapper function is called to create a game loop and handle internal game state.
         `option`: a function to be called on the Player inherited instances in `self.players` created by `__init__`.
         For example, the AI will insert controller code in here to play its turn, but an input can also be retrieved from a human.
-        Return value: the winner.
+        Development cards held at the start of a turn become usable during it.
+        Return value: the winner. `self.round` is left at the round the game was won in.
+        If `max_rounds` is given and passes without a winner, None is returned.
+        Rolling a 7 does nothing here; `turns.TurnMachine` plays turns phase by phase, with discards and the robber.
         """
-        while True:
-            for player in self.players:
-                roll = Game.dice_roll()
-                self.check_roll_result(roll)
-                option(player)
-                self.check_largest_army()
-                self.check_longest_road()
-                if self.is_winner():
-                    return self.current_actor
-                self.next_turn()
+        while max_rounds is None or self.round <= max_rounds:
+            player = self.current_actor
+            self.begin_turn(player)
+            option(player)
+            if self.end_turn():
+                return self.ledger.winner
+        return None
+
+    def begin_turn(self, player: Player, roll: int | None = None) -> int:
+        """
+        Roll the dice (unless `roll` is given) and hand out resources; development cards held now become usable,
+        and the player may play one of them this turn.
+        A 7 produces nothing: discards and the robber are left to the caller, as in `turns.TurnMachine`.
+        """
+        roll = Game.dice_roll() if roll is None else roll
+        player.emit("roll", roll)
+        self.check_roll_result(roll)
+        for card in player.development_cards:
+            card.can_use = True
+        player.played_card = False
+        return roll
+
+    @staticmethod
+    def discards_owed(player: Player) -> int:
+        """How many resources a player must discard when a 7 is rolled"""
+        return len(player.resources) // 2 if len(player.resources) > 7 else 0
+
+    def snapshot(self) -> Tuple:
+        """
+        Capture everything play can change, so that `restore` can rewind the game in place, e.g. during search.
+        Listeners are not rewound: anything they derived from events after the snapshot is left as it was.
+        """
+        board, ledger = self.board, self.ledger
+        constructions = set(item for tile in board.flat_tiles for item in tile.construction_slots if item is not None)
+        cards = self.development_cards + [card for player in self.players for card in player.development_cards]
+        return (
+            [(tile.construction_slots[:], tile.road_slots[:]) for tile in board.flat_tiles],
+            [(item, item.name) for item in constructions],
+            [(card, card.owner, card.can_use) for card in cards],
+            [(player.resources[:], player.development_cards[:], set(player.occupied_tiles), player.army_count,
+                player.played_card) for player in self.players],
+            self.development_cards[:],
+            (board.robber_tile, self.current_actor, self.round, self.player_with_largest_army,
+                self.player_with_longest_road),
+            (ledger.public[:], ledger.hidden[:], [dict(sources) for sources in ledger.contributions], ledger.winner)
+        )
+
+    def restore(self, snapshot: Tuple):
+        """Rewind the game to a `snapshot`, keeping the identity of every object"""
+        slots, constructions, cards, players, stack, state, ledger = snapshot
+        for tile, (construction_slots, road_slots) in zip(self.board.flat_tiles, slots):
+            tile.construction_slots[:] = construction_slots
+            tile.road_slots[:] = road_slots
+        for item, name in constructions:
+            item.name = name
+        for card, owner, can_use in cards:
+            card.owner = owner
+            card.can_use = can_use
+        for player, (resources, development_cards, occupied_tiles, army_count, played_card) in zip(self.players, players):
+            player.resources[:] = resources
+            player.development_cards[:] = development_cards
+            player.occupied_tiles = set(occupied_tiles)
+            player.army_count = army_count
+            player.played_card = played_card
+        self.development_cards[:] = stack
+        robber_tile, self.current_actor, self.round, self.player_with_largest_army, self.player_with_longest_road = state
+        self.board.robber_tile.has_robber = False
+        robber_tile.has_robber = True
+        self.board.robber_tile = robber_tile
+        public, hidden, contributions, self.ledger.winner = ledger
+        self.ledger.public[:] = public
+        self.ledger.hidden[:] = hidden
+        for sources, saved in zip(self.ledger.contributions, contributions):
+            sources.update(saved)
+
+    def end_turn(self) -> bool:
+        """Settle awards for the current actor, then pass the turn on unless there is a winner"""
+        if not self.is_winner():
+            self.check_largest_army()
+            self.check_longest_road()
+        if self.is_winner():
+            return True
+        self.next_turn()
+        if self.current_actor is self.players[0]:
+            self.round += 1
+        return False
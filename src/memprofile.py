@@ -0,0 +1,102 @@
+"""
+Opt-in memory instrumentation for simulation batches, enabled with `python -m simulate --memory`.
+Each game is played under tracemalloc with automatic garbage collection paused, then collected once: whatever only
+that collection frees was kept alive by reference cycles, and is reported by type.
+"""
+from __future__ import annotations
+import gc
+import sys
+import tracemalloc
+import weakref
+from collections import Counter
+from typing import Callable, Dict, List
+import game as engine
+
+def profile_game(play: Callable[..., Dict], *args, top: int = 5) -> Dict:
+    """
+    Run `play(*args, turn_hook=...)` and return its result with a "memory" entry holding, in bytes:
+    the game's peak allocation, the growth and peak of each turn, what is still allocated after collection,
+    the cyclic garbage by type and the source lines that allocated most. "engine_objects" counts the objects of
+    `game` classes that outlived the finished game until the collector ran.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    gc.collect()
+    gc.disable()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        games: List[weakref.ref] = []
+        turn_starts: List[int] = []
+        turn_peaks: List[int] = []
+        def turn_hook(game):
+            current, peak = tracemalloc.get_traced_memory()
+            if not games:
+                games.append(weakref.ref(game))
+            elif turn_starts:
+                turn_peaks.append(peak - turn_starts[-1])
+            turn_starts.append(current)
+            tracemalloc.reset_peak()
+        result = play(*args, turn_hook=turn_hook)
+        current, peak = tracemalloc.get_traced_memory()
+        game_peak = max([peak - baseline] + [start - baseline for start in turn_starts])
+        sites = [[str(stat.traceback[0]), stat.size_diff]
+            for stat in tracemalloc.take_snapshot().compare_to(before, "lineno")[:top]]
+        del before
+        game_survived = bool(games) and games[0]() is not None # the game itself was only held by cycles
+
+        gc.set_debug(gc.DEBUG_SAVEALL)
+        gc.collect()
+        cyclic = Counter(type(item).__name__ for item in gc.garbage)
+        engine_objects = sum(type(item).__module__ == engine.__name__ for item in gc.garbage)
+        cyclic_bytes = sum(sys.getsizeof(item) for item in gc.garbage)
+        gc.garbage.clear()
+    finally:
+        gc.set_debug(0)
+        gc.enable()
+    gc.collect()
+    turn_growth = [end - start for start, end in zip(turn_starts, turn_starts[1:] + [current])]
+    result["memory"] = {
+        "peak": game_peak,
+        "turn_growth": sum(turn_growth) // max(len(turn_growth), 1),
+        "turn_peak": max(turn_peaks, default=0),
+        "retained": tracemalloc.get_traced_memory()[0] - baseline,
+        "game_survived": game_survived,
+        "engine_objects": engine_objects,
+        "cyclic_objects": dict(cyclic.most_common()),
+        "cyclic_bytes": cyclic_bytes,
+        "sites": sites
+    }
+    return result
+
+def add_memory(totals: Dict | None, memory: Dict) -> Dict:
+    """Fold one game's "memory" entry into batch totals, kept as plain JSON so they can be checkpointed"""
+    if totals is None:
+        totals = {"games": 0, "peak": 0, "max_peak": 0, "turn_growth": 0, "max_turn_peak": 0, "retained": 0,
+            "cyclic_games": 0, "surviving_games": 0, "cyclic_bytes": 0, "cyclic_objects": {}}
+    totals["games"] += 1
+    totals["peak"] += memory["peak"]
+    totals["max_peak"] = max(totals["max_peak"], memory["peak"])
+    totals["turn_growth"] += memory["turn_growth"]
+    totals["max_turn_peak"] = max(totals["max_turn_peak"], memory["turn_peak"])
+    totals["retained"] += memory["retained"]
+    totals["cyclic_games"] += memory["engine_objects"] > 0
+    totals["surviving_games"] += memory["game_survived"]
+    totals["cyclic_bytes"] += memory["cyclic_bytes"]
+    for name, count in memory["cyclic_objects"].items():
+        totals["cyclic_objects"][name] = totals["cyclic_objects"].get(name, 0) + count
+    return totals
+
+def memory_report(totals: Dict, top: int = 8) -> str:
+    games = max(totals["games"], 1)
+    kib = lambda size: f"{size / 1024:.1f} KiB"
+    cyclic = sorted(totals["cyclic_objects"].items(), key=lambda item: item[1], reverse=True)[:top]
+    return "\n".join([
+        f"memory: peak {kib(totals['peak'] / games)} per game (max {kib(totals['max_peak'])}), "
+        f"turn growth {kib(totals['turn_growth'] / games)} (max turn peak {kib(totals['max_turn_peak'])})",
+        f"retained after collection: {kib(totals['retained'] / games)} per game",
+        f"games leaving engine objects to the cycle collector: {totals['cyclic_games']}/{totals['games']} "
+        f"({totals['surviving_games']} whole games), {kib(totals['cyclic_bytes'] / games)} of cyclic garbage per game",
+        "cyclic objects per game: " + ", ".join(f"{name} {count / games:.0f}" for name, count in cyclic)
+    ])
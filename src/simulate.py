@@ -0,0 +1,294 @@
+"""
+Run batches of bot games from the command line, e.g. from `src/`:
+    python -m simulate --games 1000 --bots greedy random random random --workers 4 --output results.jsonl
+"""
+from __future__ import annotations
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import signal
+import sys
+import time
+from multiprocessing import Pool
+from typing import Callable, Dict, List, Set, Tuple
+from game import Game, Player, Board
+from bots import BOTS
+from turns import TurnMachine
+from encoder import ActionSpace
+from trade import TradeEngine
+from memprofile import profile_game, add_memory, memory_report
+from store import StoreWriter, new_shard
+
+BOARDS = {
+    "standard": Board,
+    "extension": lambda: Board.generate(Board.hexagon_layout(3, 6))
+}
+
+def run_game(seed: int, bot_names: List[str], board: str = "standard", max_rounds: int = 500, memory: bool = False,
+        turn_hook: Callable[[Game], None] | None = None) -> Dict:
+    """Play one seeded game between named bots and return its result as a plain dict"""
+    if memory:
+        return profile_game(run_game, seed, bot_names, board, max_rounds)
+    random.seed(seed)
+    players = [Player(f"{name} {e}") for e, name in enumerate(bot_names)]
+    game = Game(board=BOARDS[board](), players=players)
+    controllers = {player: BOTS[name](game) for player, name in zip(players, bot_names)}
+    gained = dict.fromkeys(players, 0)
+    cards_bought = dict.fromkeys(players, 0)
+    def count(event: str, player: Player, *args):
+        match event:
+            case "collect" | "year of plenty":
+                gained[player] += len(args[0])
+            case "steal":
+                gained[player] += 1
+            case "monopoly":
+                gained[player] += sum(taken for _, taken in args[1])
+            case "buy card":
+                cards_bought[player] += 1
+    game.listeners.append(count)
+    game.setup(lambda player: controllers[player].place_initial(player))
+    turns = 0
+    def begin_turn(game: Game):
+        nonlocal turns
+        turns += 1
+        if turn_hook:
+            turn_hook(game)
+    start = time.perf_counter()
+    machine = TurnMachine(game, ActionSpace(game, TradeEngine(game)))
+    winner = machine.play(lambda player, mask: controllers[player].choose(player, mask), max_rounds,
+        begin_turn)
+    return {
+        "seed": seed,
+        "winner": None if winner is None else players.index(winner),
+        "rounds": game.round if winner is not None else game.round - 1,
+        "turns": turns,
+        "victory_points": [game.ledger.total(player) for player in players],
+        "longest_road": [player.longest_road for player in players],
+        "army": [player.army_count for player in players],
+        "resources_gained": [gained[player] for player in players],
+        "settlements": [sum(item.name == "Settlement" for item in player.constructions) for player in players],
+        "cities": [sum(item.name == "City" for item in player.constructions) for player in players],
+        "roads": [len(player.roads) for player in players],
+        "development_cards": [cards_bought[player] for player in players],
+        "seconds": time.perf_counter() - start
+    }
+
+def run_game_args(args: Tuple) -> Dict:
+    return run_game(*args)
+
+class Summary:
+    """Running totals over a batch of game results"""
+
+    def __init__(self, seats: int):
+        self.games = 0
+        self.turns = 0
+        self.rounds = 0
+        self.unfinished = 0
+        self.wins = [0 for _ in range(seats)]
+        self.seconds = 0.0 # wall time, summed over every session of a resumed batch
+        self.memory: Dict | None = None
+
+    def add(self, result: Dict):
+        self.games += 1
+        self.turns += result["turns"]
+        self.rounds += result["rounds"]
+        if result["winner"] is None:
+            self.unfinished += 1
+        else:
+            self.wins[result["winner"]] += 1
+        if "memory" in result:
+            self.memory = add_memory(self.memory, result["memory"])
+
+    def report(self, bot_names: List[str]) -> str:
+        seconds = max(self.seconds, 1e-9)
+        lines = [
+            f"{self.games} games in {seconds:.2f}s: {self.games / seconds:.1f} games/sec, "
+            f"{self.turns / seconds:.0f} turns/sec",
+            f"mean rounds: {self.rounds / max(self.games, 1):.1f}, unfinished: {self.unfinished}"
+        ]
+        lines.extend(f"seat {e} ({name}): {wins / max(self.games, 1):.1%} wins"
+            for e, (name, wins) in enumerate(zip(bot_names, self.wins)))
+        if self.memory:
+            lines.append(memory_report(self.memory))
+        return "\n".join(lines)
+
+class Checkpoint:
+    """
+    Progress of a batch saved to disk, so that an interrupted run resumes without redoing or double counting games.
+    Records the seeds of completed games, the summary so far and how many bytes of the partial results file 
+    (and rows of the result store shard, which it names) those games account for: anything written after that is
+    truncated on resume, as those games are replayed.
+    Games are deterministic given their seed, so unfinished games are simply replayed rather than snapshotted.
+    """
+
+    def __init__(self, path: str, settings: Dict):
+        self.path = path
+        self.settings = settings
+        self.completed: Set[int] = set()
+        self.output_size = 0
+        self.store_shard: str | None = None
+        self.store_rows = 0
+
+    @staticmethod
+    def seed_ranges(seeds: Set[int]) -> List[List[int]]:
+        """Compress a set of seeds into sorted, inclusive [first, last] ranges"""
+        ranges = []
+        for seed in sorted(seeds):
+            if ranges and ranges[-1][1] == seed - 1:
+                ranges[-1][1] = seed
+            else:
+                ranges.append([seed, seed])
+        return ranges
+
+    def load(self, summary: Summary) -> bool:
+        """Restore progress into this checkpoint and `summary`; return False if there is nothing to resume"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        assert state["settings"] == self.settings, f"{self.path} was written for a different batch: {state['settings']}"
+        self.completed = set(seed for first, last in state["completed"] for seed in range(first, last + 1))
+        self.output_size = state["output_size"]
+        self.store_shard = state["store_shard"]
+        self.store_rows = state["store_rows"]
+        summary.__dict__.update(state["summary"])
+        return True
+
+    def save(self, summary: Summary):
+        state = {
+            "settings": self.settings,
+            "completed": self.seed_ranges(self.completed),
+            "output_size": self.output_size,
+            "store_shard": self.store_shard,
+            "store_rows": self.store_rows,
+            "summary": summary.__dict__
+        }
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+def run_batch(args: argparse.Namespace) -> Summary:
+    """
+    Play every game of the batch. Results go to `<output>.partial` and are renamed to `output` once the 
+    batch completes, so a results file is never left half written. With a store path, results are also appended
+    to a new shard of the store, recording the bots and board (a resumed batch reopens its shard). With a checkpoint path, progress is saved 
+    every `checkpoint_every` seconds and on interruption, and a rerun of the same command resumes from it.
+    """
+    summary = Summary(len(args.bots))
+    settings = {key: getattr(args, key) for key in ("games", "seed", "bots", "board", "max_rounds", "output", "memory",
+        "store")}
+    checkpoint = Checkpoint(args.checkpoint, settings) if args.checkpoint else None
+    resumed = checkpoint is not None and checkpoint.load(summary)
+    store = None
+    if args.store:
+        shard = checkpoint.store_shard if resumed else new_shard()
+        store = StoreWriter(args.store, len(args.bots), shard,
+            metadata={"bots": args.bots, "board": args.board, "max_rounds": args.max_rounds})
+        if checkpoint:
+            checkpoint.store_shard = shard
+        if resumed:
+            store.truncate(checkpoint.store_rows)
+    # opened after the store, which may refuse the batch, so that a failed start leaves no partial file
+    partial = f"{args.output}.partial" if args.output else None
+    if partial and resumed:
+        os.truncate(partial, checkpoint.output_size)
+    output = open(partial, "ab" if resumed else "wb") if partial else None
+    completed = checkpoint.completed if checkpoint else set()
+    jobs = [(args.seed + e, args.bots, args.board, args.max_rounds, args.memory) for e in range(args.games)
+        if args.seed + e not in completed]
+
+    start = last_save = time.perf_counter()
+    def save():
+        nonlocal start
+        now = time.perf_counter()
+        summary.seconds += now - start
+        start = now
+        if output:
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.output_size = output.tell()
+        if store:
+            store.flush()
+            checkpoint.store_rows = store.rows
+        checkpoint.save(summary)
+
+    if args.workers > 1:
+        pool = Pool(args.workers)
+        results = pool.imap_unordered(run_game_args, jobs, chunksize=max(1, len(jobs) // (args.workers * 8)))
+    else:
+        pool = None
+        results = map(run_game_args, jobs)
+    try:
+        for result in results:
+            summary.add(result)
+            completed.add(result["seed"])
+            if output:
+                output.write(json.dumps(result).encode() + b"\n")
+            if store:
+                store.append(result)
+            if checkpoint and time.perf_counter() - last_save > args.checkpoint_every:
+                save()
+                last_save = time.perf_counter()
+    except BaseException:
+        if pool:
+            pool.terminate()
+        if checkpoint:
+            save()
+        raise
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        if output:
+            output.flush()
+            os.fsync(output.fileno()) # on disk before it is renamed into place
+            output.close()
+        if store:
+            store.close()
+    summary.seconds += time.perf_counter() - start
+    if partial:
+        os.replace(partial, args.output)
+    if checkpoint and os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)
+    return summary
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="simulate", description="Run games of Catan between built-in bots")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--bots", nargs="+", default=["greedy"] * 4, choices=sorted(BOTS),
+        help="one bot name per seat, in turn order")
+    parser.add_argument("--board", default="standard", choices=sorted(BOARDS))
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game; game i uses seed + i")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--max-rounds", type=int, default=500, help="rounds after which a game is abandoned")
+    parser.add_argument("--output", help="write one JSON line per game result to this path")
+    parser.add_argument("--store", help="also append results to the columnar result store in this directory")
+    parser.add_argument("--checkpoint", help="save progress to this path, and resume from it if it exists")
+    parser.add_argument("--checkpoint-every", type=float, default=60, help="seconds between checkpoints")
+    parser.add_argument("--profile", action="store_true", help="run in-process under cProfile and print hot spots")
+    parser.add_argument("--memory", action="store_true",
+        help="trace allocations and reference cycles of every game (slow), and report them per batch")
+    return parser.parse_args(argv)
+
+def main(argv: List[str] | None = None):
+    args = parse_args(argv)
+    # let pre-emption unwind through run_batch, so the latest progress is checkpointed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(128 + signal.SIGTERM))
+    if args.profile:
+        args.workers = 1 # the profiler only sees this process
+        profiler = cProfile.Profile()
+        profiler.enable()
+    summary = run_batch(args)
+    if args.profile:
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(25)
+    print(summary.report(args.bots))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Live views of a running game as compact deltas, for watching or debugging games without serialising the board.
+A delta is a (kind, index, value) triple, the latest value of one piece of public state:
+
+    ("settlement" | "city", vertex, seat)     ("road", edge, seat)     ("robber", 0, tile)
+    ("hand" | "cards" | "points" | "army", seat, count)               ("roll", seat, number)
+    ("largest army" | "longest road" | "win", 0, seat)
+
+Vertices, edges and tiles are numbered as in `Board.index_slots`. Subscribers pull frames at their own pace:
+pending deltas with the same kind and index are coalesced, and a subscriber that falls further behind than its
+buffer allows has its deltas dropped and receives a full snapshot in its next frame, so the game never waits.
+"""
+from __future__ import annotations
+from typing import Dict, Generator, List, Tuple
+from game import Game, Player
+
+Delta = Tuple[str, int, int]
+
+class Subscription:
+    """One subscriber's pending deltas, at most `capacity` distinct ones"""
+
+    def __init__(self, spectator: Spectator, capacity: int):
+        self.spectator = spectator
+        self.capacity = capacity
+        self.pending: Dict[Tuple[str, int], int] = {}
+        self.resync = False
+        self.coalesced = 0
+        self.dropped = 0
+
+    def push(self, kind: str, index: int, value: int):
+        key = (kind, index)
+        if key in self.pending:
+            del self.pending[key] # re-inserted last, keeping pending deltas in the order of their latest change
+            self.coalesced += 1
+        elif len(self.pending) >= self.capacity:
+            self.dropped += len(self.pending) + 1
+            self.pending.clear()
+            self.resync = True
+            return
+        if not self.resync:
+            self.pending[key] = value
+
+    def poll(self) -> List[Delta]:
+        """Take every pending delta, or a full snapshot if deltas were dropped since the last poll"""
+        if self.resync:
+            self.resync = False
+            self.pending.clear()
+            return self.spectator.snapshot()
+        frame = [(kind, index, value) for (kind, index), value in self.pending.items()]
+        self.pending.clear()
+        return frame
+
+    def frames(self) -> Generator[List[Delta], None, None]:
+        """Yield frames for as long as deltas are pending; the game may move on between pulls"""
+        while self.pending or self.resync:
+            yield self.poll()
+
+    def close(self):
+        self.spectator.subscriptions.remove(self)
+
+class Spectator:
+    """Turns a game's events into deltas for its subscriptions; does no work while nobody is subscribed"""
+
+    def __init__(self, game: Game):
+        self.game = game
+        self.seats: Dict[Player, int] = {player: e for e, player in enumerate(game.players)}
+        self.tile_ids = {tile: e for e, tile in enumerate(game.board.flat_tiles)}
+        self.counts = [self.player_counts(player) for player in game.players]
+        self.subscriptions: List[Subscription] = []
+        game.listeners.append(self.on_event)
+
+    def subscribe(self, capacity: int = 256) -> Subscription:
+        """A new subscription; its first frame is a snapshot of the game so far"""
+        if not self.subscriptions: # counts aren't kept up to date while nobody watches
+            self.counts = [self.player_counts(player) for player in self.game.players]
+        subscription = Subscription(self, capacity)
+        subscription.resync = True
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def player_counts(self, player: Player) -> Tuple[int, int, int, int]:
+        return (len(player.resources), len(player.development_cards), self.game.ledger.public[self.seats[player]],
+            player.army_count)
+
+    def push(self, kind: str, index: int, value: int):
+        for subscription in self.subscriptions:
+            subscription.push(kind, index, value)
+
+    def vertex(self, construction) -> int:
+        tile = construction.tiles[0]
+        return self.game.board.vertex_ids[(tile, tile.construction_slots.index(construction))]
+
+    def on_event(self, event: str, player: Player, *args):
+        if not self.subscriptions:
+            return
+        seat = self.seats[player]
+        match event:
+            case "settlement" | "city":
+                self.push(event, self.vertex(args[0]), seat)
+            case "road":
+                self.push("road", self.game.board.edge_ids[args[0].locator], seat)
+            case "robber":
+                self.push("robber", 0, self.tile_ids[args[0]])
+            case "roll":
+                self.push("roll", seat, args[0])
+            case "largest army" | "longest road" | "win":
+                self.push(event, 0, seat)
+        # any event can change what everyone holds (a steal or monopoly changes two hands), so compare them all
+        for e, player in enumerate(self.game.players):
+            counts = self.player_counts(player)
+            if counts != self.counts[e]:
+                for kind, old, new in zip(("hand", "cards", "points", "army"), self.counts[e], counts):
+                    if old != new:
+                        self.push(kind, e, new)
+                self.counts[e] = counts
+
+    def snapshot(self) -> List[Delta]:
+        """The whole public state as deltas from an empty board"""
+        game, board = self.game, self.game.board
+        frame: List[Delta] = []
+        for vertex, (tile, idx) in enumerate(board.vertices):
+            construction = tile.construction_slots[idx]
+            if construction is not None:
+                frame.append((construction.name.lower(), vertex, self.seats[construction.owner]))
+        for edge, (tile, idx) in enumerate(board.edges):
+            if tile.road_slots[idx] is not None:
+                frame.append(("road", edge, self.seats[tile.road_slots[idx].owner]))
+        frame.append(("robber", 0, self.tile_ids[board.robber_tile]))
+        for e, player in enumerate(game.players):
+            frame.extend((kind, e, count) for kind, count in zip(("hand", "cards", "points", "army"),
+                self.player_counts(player)))
+        for kind, holder in (("largest army", game.player_with_largest_army),
+                ("longest road", game.player_with_longest_road), ("win", game.ledger.winner)):
+            if holder is not None:
+                frame.append((kind, 0, self.seats[holder]))
+        return frame
@@ -0,0 +1,256 @@
+"""
+Append-only columnar store of game results, e.g. `python -m simulate --games 100000 --store results/`.
+Each column is a raw binary file of fixed-size values (per-seat columns hold one value per seat per row), kept in
+one directory per writer so that any number of writers can append side by side without coordinating:
+
+    results/schema.json
+    results/<shard>/shard.json        what the shard's games have in common, e.g. {"bots": [...], "board": ...}
+    results/<shard>/<column>.bin
+
+`ResultStore` memory-maps every column, so aggregating or filtering touches pages only as they are read and
+never loads a whole store into memory. The files are plain arrays in native byte order, so they can also be
+opened directly, e.g. with `numpy.memmap(path, dtype=typecode)`.
+"""
+from __future__ import annotations
+import argparse
+import json
+import mmap
+import os
+import time
+import uuid
+from array import array
+from collections import Counter
+from itertools import compress
+from typing import Callable, Dict, Generator, List, Tuple
+
+# (result key, array typecode, one value per seat)
+COLUMNS: List[Tuple[str, str, bool]] = [
+    ("seed", "q", False),
+    ("winner", "b", False), # -1 for an unfinished game
+    ("rounds", "i", False),
+    ("turns", "i", False),
+    ("seconds", "f", False),
+    ("victory_points", "b", True),
+    ("longest_road", "b", True),
+    ("army", "b", True),
+    ("resources_gained", "i", True),
+    ("settlements", "b", True),
+    ("cities", "b", True),
+    ("roads", "b", True),
+    ("development_cards", "b", True)
+]
+
+def new_shard() -> str:
+    """A shard name no other writer uses: appending to one shard from two processes would misalign its columns"""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:12]}"
+
+def write_json(path: str, value):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(value, f)
+    os.replace(temporary, path)
+
+def load_schema(path: str, seats: int | None = None) -> Dict:
+    """The store's schema, written first if the store is new; `seats` must agree with an existing store"""
+    schema_path = os.path.join(path, "schema.json")
+    if os.path.exists(schema_path):
+        with open(schema_path) as f:
+            schema = json.load(f)
+        assert seats is None or schema["seats"] == seats, f"{path} stores games of {schema['seats']} players"
+        return schema
+    assert seats is not None, f"{path} is not a result store"
+    schema = {"seats": seats, "columns": COLUMNS}
+    os.makedirs(path, exist_ok=True)
+    write_json(schema_path, schema)
+    return schema
+
+class StoreWriter:
+    """
+    Appends results to one shard, buffering `buffer_rows` rows per write. A row counts once every column holds it,
+    so opening a shard trims a row that an interrupted writer left half written. Only one writer may append to
+    a shard at a time: name new ones with `new_shard`, and reopen one only to resume it. `metadata` records what
+    every game of the shard shares (e.g. the bots and board), for `ResultStore.mask` to filter on.
+    """
+
+    def __init__(self, path: str, seats: int, shard: str, buffer_rows: int = 4096, metadata: Dict | None = None):
+        self.schema = load_schema(path, seats)
+        self.directory = os.path.join(path, shard)
+        os.makedirs(self.directory, exist_ok=True)
+        metadata_path = os.path.join(self.directory, "shard.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                self.metadata = json.load(f)
+            assert metadata is None or self.metadata == metadata, f"{self.directory} holds games of {self.metadata}"
+        else:
+            self.metadata = metadata or {}
+            write_json(metadata_path, self.metadata)
+        self.buffer_rows = buffer_rows
+        self.columns = [(name, typecode, seats if per_seat else 1) for name, typecode, per_seat in self.schema["columns"]]
+        self.paths = [os.path.join(self.directory, f"{name}.bin") for name, _, _ in self.columns]
+        self.buffers = [array(typecode) for _, typecode, _ in self.columns]
+        self.rows = min(os.path.getsize(path) // (buffer.itemsize * width) if os.path.exists(path) else 0
+            for path, buffer, (_, _, width) in zip(self.paths, self.buffers, self.columns))
+        self.files = [open(path, "ab") for path in self.paths]
+        self.truncate(self.rows)
+
+    def append(self, result: Dict):
+        for (name, _, width), buffer in zip(self.columns, self.buffers):
+            value = result[name]
+            if width == 1:
+                buffer.append(-1 if value is None else value)
+            else:
+                buffer.extend(value)
+        self.rows += 1
+        if len(self.buffers[0]) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        for buffer, f in zip(self.buffers, self.files):
+            buffer.tofile(f)
+            del buffer[:]
+            f.flush()
+
+    def truncate(self, rows: int):
+        """Drop every row after the first `rows`, e.g. those a resumed batch is about to replay"""
+        self.flush()
+        for (_, _, width), buffer, f in zip(self.columns, self.buffers, self.files):
+            f.truncate(rows * width * buffer.itemsize)
+        self.rows = rows
+
+    def close(self):
+        self.flush()
+        for f in self.files:
+            os.fsync(f.fileno())
+            f.close()
+
+class ResultStore:
+    """
+    Read-only, memory-mapped view of every shard of a store. Aggregates take a column name, a seat for per-seat
+    columns, and optionally a row mask from `mask`; they run shard by shard over the mapped values.
+    `metadata` holds each shard's shard.json.
+    """
+
+    def __init__(self, path: str):
+        self.schema = load_schema(path)
+        self.seats = self.schema["seats"]
+        self.columns = {name: (typecode, self.seats if per_seat else 1)
+            for name, typecode, per_seat in self.schema["columns"]}
+        self.shards: List[Dict[str, mmap.mmap | None]] = []
+        self.rows: List[int] = []
+        self.metadata: List[Dict] = []
+        for shard in sorted(os.listdir(path)):
+            directory = os.path.join(path, shard)
+            if not os.path.isdir(directory):
+                continue
+            metadata_path = os.path.join(directory, "shard.json")
+            if os.path.exists(metadata_path):
+                with open(metadata_path) as f:
+                    self.metadata.append(json.load(f))
+            else:
+                self.metadata.append({})
+            maps, rows = {}, []
+            for name, (typecode, width) in self.columns.items():
+                column_path = os.path.join(directory, f"{name}.bin")
+                size = os.path.getsize(column_path) if os.path.exists(column_path) else 0
+                rows.append(size // (array(typecode).itemsize * width))
+                if size:
+                    with open(column_path, "rb") as f:
+                        maps[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    maps[name] = None
+            self.shards.append(maps)
+            self.rows.append(min(rows))
+
+    def __len__(self):
+        return sum(self.rows)
+
+    def chunks(self, name: str, seat: int | None = None) -> Generator[memoryview, None, None]:
+        """The column's values, one view per shard; a per-seat column without a seat is flattened row by row"""
+        typecode, width = self.columns[name]
+        assert seat is None or width > 1, f"{name} is not a per-seat column"
+        for maps, rows in zip(self.shards, self.rows):
+            if rows == 0:
+                continue
+            # cut to whole rows before casting: a crash can leave a partial value at the end of a column
+            view = memoryview(maps[name])[:rows * width * array(typecode).itemsize].cast(typecode)
+            yield view if seat is None else view[seat::width]
+
+    def values(self, name: str, seat: int | None = None, mask: bytearray | None = None) -> Generator:
+        """Iterate the column's values, only over rows where `mask` is set if one is given"""
+        width = self.columns[name][1] if seat is None else 1
+        offset = 0
+        for view in self.chunks(name, seat):
+            if mask is None:
+                yield from view
+                continue
+            rows = len(view) // width
+            selected = mask[offset:offset + rows]
+            yield from compress(view, selected if width == 1 else (keep for keep in selected for _ in range(width)))
+            offset += rows
+
+    def mask(self, where: Dict[str | Tuple[str, int], Callable]) -> bytearray:
+        """
+        One byte per row, set where every condition holds. Keys are column names, (column, seat) pairs, or keys of
+        the shards' metadata such as "bots" or "board", whose conditions are checked once per shard.
+        """
+        mask = bytearray(b"\x01") * len(self)
+        for key, condition in where.items():
+            if key not in self.columns and not isinstance(key, tuple):
+                shards = bytearray(b"".join((b"\x01" if condition(metadata.get(key)) else b"\x00") * rows
+                    for metadata, rows in zip(self.metadata, self.rows)))
+                mask = bytearray(map(lambda keep, shard: keep and shard, mask, shards))
+                continue
+            name, seat = key if isinstance(key, tuple) else (key, None)
+            assert self.columns[name][1] == 1 or seat is not None, f"give a seat to filter on {name}"
+            mask = bytearray(map(lambda keep, value: keep and condition(value), mask, self.values(name, seat)))
+        return mask
+
+    def count(self, mask: bytearray | None = None) -> int:
+        return len(self) if mask is None else mask.count(1)
+
+    def sum(self, name: str, seat: int | None = None, mask: bytearray | None = None) -> int | float:
+        if mask is None:
+            return sum(sum(view) for view in self.chunks(name, seat))
+        return sum(self.values(name, seat, mask))
+
+    def mean(self, name: str, seat: int | None = None, mask: bytearray | None = None) -> float:
+        rows = self.count(mask) * (self.seats if seat is None and self.columns[name][1] > 1 else 1)
+        return self.sum(name, seat, mask) / max(rows, 1)
+
+    def counts(self, name: str, seat: int | None = None, mask: bytearray | None = None) -> Counter:
+        return Counter(self.values(name, seat, mask))
+
+    def close(self):
+        for maps in self.shards:
+            for mapped in maps.values():
+                if mapped is not None:
+                    mapped.close()
+        self.shards = []
+        self.rows = []
+        self.metadata = []
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(prog="store", description="Summarise a result store")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+    store = ResultStore(args.path)
+    print(f"{len(store)} games in {len(store.shards)} shards")
+    # seats only compare between games of the same bots on the same board
+    lineups = sorted(set((tuple(metadata.get("bots") or ()), metadata.get("board")) for metadata in store.metadata),
+        key=str)
+    for bots, board in lineups:
+        games = store.mask({"bots": lambda value: tuple(value or ()) == bots, "board": lambda value: value == board})
+        winners = store.counts("winner", mask=games)
+        print(f"{' '.join(bots) or 'unknown bots'} on {board or 'an unknown board'}: {store.count(games)} games, "
+            f"mean rounds {store.mean('rounds', mask=games):.1f}, unfinished {winners[-1]}")
+        for seat in range(store.seats):
+            won = store.mask({"bots": lambda value: tuple(value or ()) == bots,
+                "board": lambda value: value == board, "winner": lambda winner: winner == seat})
+            print(f"  seat {seat}: {winners[seat] / max(store.count(games), 1):.1%} wins, "
+                f"mean victory points {store.mean('victory_points', seat, games):.2f}, "
+                f"mean resources gained {store.mean('resources_gained', seat, games):.1f} "
+                f"({store.mean('resources_gained', seat, won):.1f} when winning)")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,24 @@
 """Tests to run via pytest"""
+import asyncio
+import io
+import json
+import random
+import sys
+from math import log
 from game import *
+from encoder import ObservationEncoder, ActionSpace
+from tracker import ResourceTracker
+from bots import GreedyBot, RolloutBot
+import simulate
+from simulate import run_game, main as simulate_main
+from evaluate import wilson_interval, SequentialTest, Evaluation, main as evaluate_main
+from arena import Arena, BOT_PROCESS
+from bot_process import serve
+from store import StoreWriter, ResultStore, new_shard
+from spectator import Spectator
+from turns import TurnMachine, Phase
+from trade import TradeEngine, pack, unpack, covers, counts, build_valuation
+from fuzz import Position, Reference, CHECKS, fuzz, shrink
 
 class TestClass:
     def test_resources(self):
@@ -435,6 +454,618 @@ class TestClass:
     def test_create_game(self):
         game = Game()
         assert [player.name for player in game.players] == ["Alice", "Bob", "Charlie", "Dennis"]
-        game.players[1].victory_points = 5
-        game.players[3].victory_points = 3
+        game.ledger.record(game.players[1], "Victory Point Card", 5)
+        game.ledger.record(game.players[3], "Victory Point Card", 3)
         assert str(game) == "Bob: 5, Dennis: 3, Alice: 0, Charlie: 0"
+
+    def test_board_slot_index(self):
+        board = Board()
+        assert len(board.flat_tiles) == 19
+        assert len(board.vertices) == 54
+        assert len(board.edges) == 72
+        assert board.vertex_ids[(board.tile_at(0, 1), 4)] == board.vertex_ids[(board.tile_at(0, 2), 0)]
+        assert board.edge_ids[(board.tile_at(0, 1), 2)] == board.edge_ids[(board.tile_at(1, 2), 5)]
+        assert board.positions[board.tile_at(3, 1)] == (3, 1)
+
+    def test_observation_encoder(self):
+        game = Game()
+        encoder = ObservationEncoder(game)
+        alice, bob = game.players[:2]
+        game.board.init_player_position(alice, [(0, 0, 1)], [(0, 0, 1)])
+        game.board.init_player_position(bob, [(2, 2, 0)], [])
+        bob.resources.extend([Resource.Ore, Resource.Ore, Resource.Wool])
+        view = encoder.encode(bob)
+        assert view.obj is encoder.buffer
+        hand = encoder.offsets["hand"][0]
+        assert list(encoder.buffer[hand:hand + 5]) == [0, 0, 2, 0, 1]
+        vertices = encoder.offsets["vertices"][0]
+        bob_vertex = game.board.vertex_ids[(game.board.tile_at(2, 2), 0)]
+        assert encoder.buffer[vertices + bob_vertex * 8] == 1 # bob is seat 0 from his own perspective
+        alice_vertex = game.board.vertex_ids[(game.board.tile_at(0, 0), 1)]
+        assert encoder.buffer[vertices + (alice_vertex * 4 + 3) * 2] == 1
+        assert sum(encoder.buffer[vertices:vertices + encoder.offsets["vertices"][1]]) == 2
+        encoder.encode(alice)
+        assert sum(encoder.buffer[hand:hand + 5]) == 0
+        assert encoder.buffer[vertices + alice_vertex * 8] == 1
+        robber = encoder.offsets["robber"][0]
+        assert encoder.buffer[robber + 9] == 1
+        tiles = encoder.offsets["tiles"][0]
+        assert encoder.buffer[tiles + 9 * encoder.tile_features] == 1 # desert terrain is untouched by encoding
+
+    def test_action_space(self):
+        game = Game()
+        actions = ActionSpace(game)
+        alice = game.players[0]
+        game.board.init_player_position(alice, [(0, 1, 2)], [(0, 1, 2)])
+        mask = actions.legal_mask(alice)
+        assert sum(mask) == 1 and mask[0] == 1
+        alice.resources.extend([Resource.Brick, Resource.Lumber])
+        mask = actions.legal_mask(alice)
+        roads = [actions.decode(e) for e, legal in enumerate(mask) if legal and e > 0]
+        assert roads and all(kind == "Road" for kind, _ in roads)
+        action = actions.road_offset + roads[0][1]
+        actions.apply(alice, action)
+        assert len(alice.roads) == 2
+        assert alice.resources == []
+        alice.resources.extend([Resource.Ore, Resource.Ore, Resource.Ore, Resource.Grain, Resource.Grain])
+        city = actions.city_offset + game.board.vertex_ids[(game.board.tile_at(0, 1), 2)]
+        assert actions.legal_mask(alice)[city] == 1
+        actions.apply(alice, city)
+        assert alice.victory_points == 2
+        assert alice.resources == []
+        alice.development_cards.append(DevelopmentCard("knight", alice, can_use=True))
+        mask = actions.legal_mask(alice)
+        assert sum(mask[actions.knight_offset:]) == 18
+
+    def test_resource_tracker(self):
+        game = Game()
+        alice, bob, charlie = game.players[:3]
+        tracker = ResourceTracker(game, alice)
+        game.board.init_player_position(bob, [(0, 0, 1)], [])
+        game.board.init_player_position(charlie, [(2, 0, 3)], [])
+        game.check_roll_result(10) # bob collects ore, charlie collects brick
+        game.check_roll_result(2)
+        game.check_roll_result(9)
+        assert tracker.total[1:3] == [2, 2]
+        assert tracker.bounds(bob, Resource.Ore) == (1, 1)
+        assert tracker.bounds(bob, Resource.Wool) == (1, 1)
+        charlie.steal_random_resource(bob)
+        assert tracker.total[1:3] == [1, 3]
+        assert tracker.bounds(bob, Resource.Ore) == (0, 1)
+        assert tracker.bounds(charlie, Resource.Ore) == (0, 1)
+        assert tracker.bounds(charlie, Resource.Brick) == (1, 1)
+        assert tracker.bounds(charlie, Resource.Grain) == (0, 0)
+        assert sum(tracker.expected(charlie)) == 3
+        alice.steal_random_resource(bob)
+        stolen = alice.resources[0]
+        low, high = tracker.bounds(alice, stolen)
+        assert low == high == 1
+        alice.development_cards.append(DevelopmentCard("monopoly", alice, can_use=True))
+        alice.use_card(alice.development_cards[0], [bob, charlie], Resource.Ore)
+        assert tracker.bounds(bob, Resource.Ore) == (0, 0)
+        assert tracker.bounds(charlie, Resource.Ore) == (0, 0)
+        for player in (bob, charlie):
+            for resource in Resource:
+                low, high = tracker.bounds(player, resource)
+                assert low <= player.resources.count(resource) <= high
+
+    def test_victory_point_ledger(self):
+        game = Game(victory_point_target=5)
+        alice, bob = game.players[:2]
+        wins = []
+        game.listeners.append(lambda event, player, *args: wins.append(player) if event == "win" else None)
+        game.board.init_player_position(alice, [(0, 1, 2), (3, 2, 2)], [])
+        game.board.init_player_position(bob, [(0, 0, 1)], [])
+        assert game.ledger.total(alice) == 2
+        alice.upgrade_settlement(game.board.tile_at(0, 1), 2, costs_resources=False)
+        assert game.ledger.contributions[0]["City"] == 2
+        assert game.ledger.contributions[0]["Settlement"] == 1
+        game.development_cards = [DevelopmentCard("victory point")]
+        alice.resources.extend([Resource.Ore, Resource.Wool, Resource.Grain])
+        alice.build("Development Card", stack=game.development_cards)
+        assert game.ledger.public[0] == alice.victory_points == 3
+        assert game.ledger.hidden[0] == 1
+        assert not game.is_winner()
+        alice.army_count = 3
+        game.check_largest_army()
+        assert game.ledger.winner is alice and wins == [alice]
+        assert game.is_winner()
+        game.current_actor = bob
+        bob.army_count = 4
+        game.check_largest_army()
+        assert game.ledger.total(alice) == 4
+        assert game.ledger.total(bob) == 3
+        assert (alice.victory_points, bob.victory_points) == (3, 3) # read from the ledger, the only record
+        assert wins == [alice]
+        try:
+            bob.victory_points = 10
+            raise Exception("Points are only written by the ledger")
+        except AttributeError:
+            pass
+
+    def test_game_wrapper_ends_on_target(self):
+        game = Game(victory_point_target=3)
+        for e, player in enumerate(game.players):
+            game.board.init_player_position(player, [(e, 1, 0)], [])
+        bob = game.players[1]
+        def option(player):
+            if player is bob and game.round == 2:
+                game.board.init_player_position(bob, [(2, 3, 0), (0, 3, 3)], [])
+        assert game.game_wrapper(option) is bob
+        assert game.round == 2
+
+    def test_generated_boards(self):
+        board = Board()
+        assert board.coordinates[board.tile_at(0, 0)] == (-1, 0)
+        assert len(board.coastline()) == 30
+        assert all(tile.neighbours[edge_idx] is None for tile, edge_idx in board.coastline())
+        extension = Board.generate(Board.hexagon_layout(3, 6))
+        assert [len(layer) for layer in extension] == [3, 4, 5, 6, 5, 4, 3]
+        assert len(extension.vertices) == 80
+        assert len(extension.edges) == 109
+        assert len(set(harbour for tile in extension.flat_tiles for harbour in tile.harbour_slots if harbour)) == 11
+        assert extension.robber_tile.terrain == "Desert"
+        for tile in extension.flat_tiles:
+            for edge_idx, neighbour in enumerate(tile.neighbours):
+                assert neighbour is None or neighbour.neighbours[(edge_idx + 3) % 6] is tile
+        large = Board.generate(Board.centred_coordinates([12] * 10), harbour_count=0)
+        assert large.tile_at(11, 9) is large.flat_tiles[-1]
+        assert len(large.edges) == 3 * 120 + len(large.coastline()) // 2 # inland edges are shared by two tiles
+        game = Game(board=extension, players=[Player(str(e)) for e in range(6)])
+        game.board.init_player_position(game.players[5], [(5, 3, 0)], [(5, 3, 0)])
+        assert len(game.players[5].constructions) == 1
+
+    def test_game_setup(self):
+        game = Game()
+        order = []
+        def place(player):
+            order.append(player.name)
+            tile, idx = game.board.vertices[len(order) * 6]
+            return SettlementOrCity(player, tile, idx)
+        game.setup(place)
+        assert order == game.default_names + game.default_names[::-1]
+        assert all(player.victory_points == 2 for player in game.players)
+        assert all(len(player.resources) >= 1 for player in game.players)
+
+    def test_spectator_deltas(self):
+        random.seed(3)
+        game = Game()
+        spectator = Spectator(game)
+        bots = {player: GreedyBot(game) for player in game.players}
+        game.setup(lambda player: bots[player].place_initial(player))
+        watcher, laggard = spectator.subscribe(), spectator.subscribe(capacity=8)
+        state = {}
+        def apply(frame):
+            for kind, index, value in frame:
+                if kind != "roll":
+                    state[(kind, index)] = value
+        apply(next(watcher.frames())) # starts from a snapshot
+        laggard.poll()
+        assert sum(kind == "settlement" for kind, _ in state) == 8
+        for _ in range(40):
+            player = game.current_actor
+            game.begin_turn(player)
+            bots[player](player)
+            for frame in watcher.frames():
+                apply(frame)
+            if game.end_turn():
+                break
+        for frame in watcher.frames():
+            apply(frame)
+        cities = set(index for kind, index in state if kind == "city")
+        assert {key: value for key, value in state.items() if key[0] != "settlement" or key[1] not in cities} == \
+            {(kind, index): value for kind, index, value in spectator.snapshot()}
+        assert watcher.dropped == 0 and watcher.coalesced > 0 # hands change several times a turn
+        assert laggard.dropped > 0 and laggard.poll() == spectator.snapshot() # too far behind: resynced
+        watcher.close()
+        laggard.close()
+        assert not spectator.subscriptions
+
+    def test_turn_machine_seven(self):
+        game = Game(players=[Player("Alice"), Player("Bob"), Player("Charlie")])
+        alice, bob, charlie = game.players
+        board = game.board
+        board.init_player_position(bob, [(0, 1, 2)], [(0, 1, 2)])
+        alice.resources.extend([Resource.Ore] * 9)
+        charlie.resources.extend([Resource.Wool] * 8)
+        bob.resources.append(Resource.Brick)
+        machine = TurnMachine(game)
+        actions = machine.actions
+        assert machine.phase is Phase.Roll and list(machine.legal_mask()).index(1) == actions.roll_action
+        machine.roll(7)
+        assert machine.phase is Phase.Discard and machine.actor is alice and machine.owed[0] == 4
+        assert [e for e, legal in enumerate(machine.legal_mask()) if legal] == [actions.discard_offset + 2]
+        for _ in range(4):
+            machine.step(actions.discard_offset + Resource.Ore.value - 1)
+        assert machine.actor is charlie and machine.owed[2] == 4
+        for _ in range(4):
+            machine.step(actions.discard_offset + Resource.Wool.value - 1)
+        assert len(alice.resources) == 5 and len(charlie.resources) == 4 and len(bob.resources) == 1
+        assert machine.phase is Phase.Robber and machine.actor is alice
+        before = machine.snapshot()
+        target = board.flat_tiles.index(board.tile_at(0, 1))
+        machine.step(actions.robber_offset + target)
+        assert machine.phase is Phase.Steal
+        assert [e for e, legal in enumerate(machine.legal_mask()) if legal] == [actions.steal_offset + 1]
+        machine.step(actions.steal_offset + 1)
+        assert bob.resources == [] and alice.resources.count(Resource.Brick) == 1
+        assert machine.phase is Phase.Build
+        machine.step(0)
+        assert machine.phase is Phase.Roll and machine.actor is bob
+        machine.restore(before)
+        assert machine.phase is Phase.Robber and machine.actor is alice and game.current_actor is alice
+        assert bob.resources == [Resource.Brick] and len(alice.resources) == 5
+        assert board.robber_tile.terrain == "Desert"
+        try:
+            machine.step(0)
+            raise Exception("Ending the turn is not an action of the robber phase")
+        except Exception as e:
+            assert "Robber phase" in str(e)
+        machine.restore(before)
+        machine.step(actions.robber_offset + target)
+        machine.step(actions.steal_offset + 1)
+        assert machine.phase is Phase.Build
+        for action in (actions.roll_action, actions.discard_offset, actions.robber_offset + 3, actions.steal_offset + 1):
+            try:
+                machine.step(action)
+                raise Exception(f"{actions.decode(action)[0]} is an action of the build phase")
+            except Exception as e:
+                assert "Build phase" in str(e)
+            try:
+                actions.apply(alice, action)
+                raise Exception(f"{actions.decode(action)[0]} can be applied on a turn")
+            except Exception as e:
+                assert "own turn" in str(e)
+        assert machine.phase is Phase.Build and machine.actor is alice
+
+    def test_turn_machine_one_card_per_turn(self):
+        game = Game(players=[Player("Alice"), Player("Bob")])
+        alice, bob = game.players
+        game.board.init_player_position(bob, [(0, 1, 2)], [(0, 1, 2)])
+        alice.development_cards.extend([DevelopmentCard("knight"), DevelopmentCard("knight")])
+        for card in alice.development_cards:
+            card.owner = alice
+        machine = TurnMachine(game)
+        actions = machine.actions
+        knights = lambda: sum(machine.legal_mask()[actions.knight_offset:actions.discard_offset])
+        machine.roll(8)
+        assert machine.phase is Phase.Build and knights() == len(game.board.flat_tiles) - 1
+        before = machine.snapshot()
+        machine.step(actions.knight_offset + game.board.flat_tiles.index(game.board.tile_at(0, 0)))
+        assert alice.played_card and len(alice.development_cards) == 1
+        assert machine.phase is Phase.Build and knights() == 0 # the second knight waits for another turn
+        try:
+            machine.step(actions.knight_offset + game.board.flat_tiles.index(game.board.tile_at(0, 1)))
+            raise Exception("A second card was played in one turn")
+        except AssertionError:
+            pass
+        machine.restore(before)
+        assert not alice.played_card and knights() > 0
+        machine.step(actions.knight_offset + game.board.flat_tiles.index(game.board.tile_at(0, 0)))
+        machine.step(0)
+        machine.roll(8)
+        machine.step(0)
+        machine.roll(8)
+        assert machine.actor is alice and not alice.played_card and knights() > 0 # her next turn
+
+    def test_turn_machine_rollback(self):
+        random.seed(5)
+        game = Game()
+        bots = {player: GreedyBot(game) for player in game.players}
+        game.setup(lambda player: bots[player].place_initial(player))
+        machine = TurnMachine(game)
+        encoder = ObservationEncoder(game)
+        decide = lambda player, mask: bots[player].choose(player, mask)
+        for _ in range(150):
+            machine.step(decide(machine.actor, machine.legal_mask()))
+        state = lambda: ([encoder.encode(player).tolist() for player in game.players], machine.phase, machine.actor,
+            len(game.development_cards), game.ledger.public[:], game.ledger.hidden[:], game.round)
+        before, snapshot = state(), machine.snapshot()
+        for _ in range(2):
+            for _ in range(150):
+                if machine.phase is not Phase.Over:
+                    machine.step(decide(machine.actor, machine.legal_mask()))
+            assert state() != before
+            machine.restore(snapshot)
+            assert state() == before
+        assert machine.play(decide, max_rounds=200) is game.ledger.winner is not None
+
+    def test_trade_vectors(self):
+        hand = counts([Resource.Ore, Resource.Ore, Resource.Wool])
+        assert hand == (0, 0, 2, 0, 1) and unpack(pack(hand)) == hand
+        assert covers(pack(hand), pack((0, 0, 2, 0, 0))) and covers(pack(hand), pack((0, 0, 1, 0, 1)))
+        assert not covers(pack(hand), pack((0, 0, 3, 0, 0))) and not covers(pack(hand), pack((1, 0, 0, 0, 0)))
+
+    def test_trade_engine(self):
+        game = Game(players=[Player("Alice"), Player("Bob"), Player("Charlie")])
+        alice, bob, charlie = game.players
+        tracker = ResourceTracker(game, charlie)
+        alice.resources.extend([Resource.Ore, Resource.Ore, Resource.Ore, Resource.Grain, Resource.Lumber])
+        bob.resources.extend([Resource.Grain, Resource.Brick, Resource.Wool])
+        tracker.gain(0, Resource.Ore.value - 1, 3) # the tracker starts out knowing both hands
+        tracker.gain(0, Resource.Grain.value - 1, 1)
+        tracker.gain(0, Resource.Lumber.value - 1, 1)
+        for resource in bob.resources:
+            tracker.gain(1, resource.value - 1, 1)
+        engine = TradeEngine(game)
+        assert len(engine.sides) == 20
+        matches = engine.acceptable(alice, bob)
+        assert matches and engine.acceptable(alice, bob) is matches # cached while neither hand changes
+        partner, give, get = engine.best_trade(alice)
+        assert partner is bob and give == [Resource.Ore] and get == [Resource.Brick] # a spare ore for alice's road
+        before = build_valuation(alice, counts(alice.resources)), build_valuation(bob, counts(bob.resources))
+        assert engine.execute(alice)
+        assert Construction.has_resources_for(alice, "Road") and bob.resources.count(Resource.Ore) == 1
+        assert build_valuation(alice, counts(alice.resources)) > before[0]
+        assert build_valuation(bob, counts(bob.resources)) > before[1]
+        assert tracker.bounds(alice, Resource.Brick) == (1, 1) and tracker.bounds(bob, Resource.Ore) == (1, 1)
+        assert engine.acceptable(alice, bob) is not matches
+        assert engine.best_trade(charlie) is None # nothing to trade with
+        ore_only = TradeEngine(game, valuation=lambda player, hand: hand[Resource.Ore.value - 1])
+        assert ore_only.best_trade(alice) is None and ore_only.best_trade(bob) is None # nobody gives ore away
+        actions = ActionSpace(game, engine)
+        assert actions.decode(actions.trade_action) == ("Trade", 0)
+        assert actions.legal_mask(charlie)[actions.trade_action] == 0
+        alice.resources = [Resource.Ore, Resource.Ore, Resource.Ore, Resource.Grain, Resource.Lumber]
+        bob.resources = [Resource.Grain, Resource.Brick, Resource.Wool]
+        assert actions.legal_mask(alice)[actions.trade_action] == 1
+        actions.apply(alice, actions.trade_action)
+        assert Resource.Brick in alice.resources
+
+    def test_rollout_policy(self):
+        random.seed(9)
+        game = Game()
+        bot = RolloutBot(game)
+        assert len(bot.priorities) == 5 ** 5 and bot.priorities[0] == ()
+        alice = game.players[0]
+        alice.resources = [Resource.Ore] * 3 + [Resource.Grain] * 2 + [Resource.Brick, Resource.Lumber]
+        assert bot.priorities[bot.hand_index(alice)] == ("City", "Road")
+        alice.resources = [Resource.Ore] * 3 + [Resource.Grain] * 2 + [Resource.Brick, Resource.Lumber, Resource.Wool]
+        assert bot.priorities[bot.hand_index(alice)] == ("City", "Settlement", "Development Card", "Road")
+        alice.resources = [Resource.Ore] * 3 + [Resource.Grain] * 2 + [Resource.Wool]
+        assert bot.priorities[bot.hand_index(alice)] == ("City", "Development Card")
+        alice.resources = [Resource.Wool] * 6 + [Resource.Brick, Resource.Lumber, Resource.Grain]
+        assert bot.discards[bot.hand_index(alice)] == Resource.Wool.value - 1 # keeps the settlement
+        alice.resources = []
+        game.setup(lambda player: bot.place_initial(player))
+        machine = TurnMachine(game, ActionSpace(game, TradeEngine(game)))
+        offered = 0
+        while machine.phase is not Phase.Over and game.round <= 20:
+            mask = machine.legal_mask()
+            action = bot.choose(machine.actor, mask)
+            assert mask[action] and action != machine.actions.trade_action
+            offered += mask[machine.actions.trade_action]
+            if machine.phase is Phase.Build:
+                assert bot.build(machine.actor) == action # the same move without the mask
+            machine.step(action)
+        assert offered > 0 # trades were legal, but the policy never trades
+        snapshot = machine.snapshot()
+        winners = set()
+        for seed in range(3):
+            random.seed(seed)
+            machine.restore(snapshot)
+            winners.add(bot.playout(machine))
+            assert machine.phase is Phase.Over and game.round > 20
+        assert None not in winners
+        game = Game()
+        bot = RolloutBot(game)
+        game.setup(lambda player: bot.place_initial(player))
+        assert game.game_wrapper(bot, max_rounds=300) is game.ledger.winner is not None
+
+    def test_simulate(self, capsys, tmp_path):
+        result = run_game(7, ["greedy", "random", "greedy"], max_rounds=30)
+        assert result["turns"] <= 90
+        assert result == {**run_game(7, ["greedy", "random", "greedy"], max_rounds=30), "seconds": result["seconds"]}
+        output = tmp_path / "results.jsonl"
+        simulate_main(["--games", "2", "--bots", "random", "greedy", "--max-rounds", "20", "--output", str(output)])
+        assert len(output.read_text().splitlines()) == 2
+        report = capsys.readouterr().out
+        assert "games/sec" in report and "seat 1 (greedy)" in report
+
+    def test_simulate_memory_profile(self, capsys):
+        result = run_game(4, ["greedy", "random"], max_rounds=20, memory=True)
+        assert result == {**run_game(4, ["greedy", "random"], max_rounds=20), "memory": result["memory"],
+            "seconds": result["seconds"]}
+        memory = result["memory"]
+        assert memory["peak"] > memory["turn_peak"] > 0
+        assert memory["cyclic_objects"]["Tile"] == 19 # tiles and their neighbours reference each other
+        assert memory["engine_objects"] >= 19
+        simulate_main(["--games", "2", "--bots", "greedy", "random", "--max-rounds", "20", "--memory"])
+        assert "games leaving engine objects to the cycle collector: 2/2" in capsys.readouterr().out
+
+    def test_simulate_resumes_from_checkpoint(self, capsys, tmp_path, monkeypatch):
+        output, checkpoint = tmp_path / "results.jsonl", tmp_path / "batch.checkpoint"
+        argv = ["--games", "5", "--bots", "greedy", "greedy", "--max-rounds", "20", "--output", str(output),
+            "--checkpoint", str(checkpoint), "--checkpoint-every", "0", "--store", str(tmp_path / "store")]
+        played = []
+        def crash_on_third_game(args):
+            if len(played) == 3:
+                raise KeyboardInterrupt
+            played.append(args[0])
+            return run_game(*args)
+        monkeypatch.setattr(simulate, "run_game_args", crash_on_third_game)
+        try:
+            simulate_main(argv)
+            raise Exception("The batch should have been interrupted")
+        except KeyboardInterrupt:
+            pass
+        assert checkpoint.exists() and not output.exists()
+        assert len((tmp_path / "results.jsonl.partial").read_text().splitlines()) == 3
+        monkeypatch.undo()
+        simulate_main(argv)
+        seeds = [json.loads(line)["seed"] for line in output.read_text().splitlines()]
+        assert sorted(seeds) == [0, 1, 2, 3, 4]
+        assert not checkpoint.exists()
+        assert capsys.readouterr().out.startswith("5 games")
+        store = ResultStore(str(tmp_path / "store"))
+        assert sorted(store.values("seed")) == [0, 1, 2, 3, 4] # the two games replayed after the crash aren't doubled
+        store.close()
+        simulate_main(["--games", "5", "--bots", "random", "greedy", "--max-rounds", "20", "--store",
+            str(tmp_path / "store")])
+        store = ResultStore(str(tmp_path / "store"))
+        assert len(store.shards) == 2 and len(store) == 10 # the same seeds with other bots: a shard of their own
+        greedy_first = store.mask({"bots": lambda bots: bots == ["greedy", "greedy"]})
+        assert sorted(store.values("seed", mask=greedy_first)) == [0, 1, 2, 3, 4]
+        store.close()
+        try:
+            simulate_main(["--games", "1", "--bots", "random", "random", "random", "--store", str(tmp_path / "store"),
+                "--output", str(tmp_path / "three.jsonl")])
+            raise Exception("The store holds two-player games")
+        except AssertionError:
+            pass
+        assert not (tmp_path / "three.jsonl.partial").exists()
+
+    def test_result_store(self, tmp_path):
+        path = str(tmp_path / "store")
+        results = [{"seed": seed, "winner": None if seed == 2 else seed % 2, "rounds": 10 + seed, "turns": 20 + seed,
+            "seconds": 0.5, "victory_points": [seed, 10 - seed], "longest_road": [1, 2], "army": [0, 3],
+            "resources_gained": [100 * seed, 5], "settlements": [2, 3], "cities": [1, 0], "roads": [4, 5],
+            "development_cards": [0, 1]} for seed in range(6)]
+        for shard, rows in (("a", results[:4]), ("b", results[4:])):
+            writer = StoreWriter(path, 2, shard, buffer_rows=3, metadata={"bots": ["x", shard]})
+            for result in rows:
+                writer.append(result)
+            writer.close()
+        with open(tmp_path / "store" / "b" / "seed.bin", "ab") as f:
+            f.write(b"\0" * 8) # a row torn by a crash: only one column was written
+        with open(tmp_path / "store" / "b" / "rounds.bin", "ab") as f:
+            f.write(b"\0" * 3) # and only part of a value of another
+        store = ResultStore(path)
+        assert len(store) == 6
+        assert list(store.values("seed")) == [0, 1, 2, 3, 4, 5]
+        assert store.counts("winner") == {0: 2, 1: 3, -1: 1}
+        assert store.sum("resources_gained", 0) == 1500
+        assert store.mean("victory_points") == 5
+        won = store.mask({"winner": lambda winner: winner == 1, ("victory_points", 1): lambda points: points < 8})
+        assert store.count(won) == 2 # seeds 3 and 5, seed 1 is excluded by its victory points
+        assert list(store.values("victory_points", mask=won)) == [3, 7, 5, 5]
+        assert store.mean("rounds", mask=won) == 14
+        assert list(store.values("seed", mask=store.mask({"bots": lambda bots: "b" in bots}))) == [4, 5]
+        assert store.metadata == [{"bots": ["x", "a"]}, {"bots": ["x", "b"]}]
+        store.close()
+        try:
+            StoreWriter(path, 2, "b", metadata={"bots": ["y", "b"]})
+            raise Exception("A shard only holds games of one lineup")
+        except AssertionError:
+            pass
+        assert new_shard() != new_shard()
+        assert StoreWriter(path, 2, "b").rows == 2
+        try:
+            StoreWriter(path, 3, "c")
+            raise Exception("A store only holds games with one number of players")
+        except AssertionError:
+            pass
+
+    def test_sequential_test(self):
+        low, high = wilson_interval(50, 100, 0.95)
+        assert 0.4 < low < 0.5 < high < 0.6
+        assert wilson_interval(0, 10, 0.95)[0] < 1e-9
+        test = SequentialTest(0.5, margin=0.1, error=0.05)
+        for _ in range(5):
+            test.add(True)
+            test.add(False)
+        assert test.decision is None
+        while test.decision is None:
+            test.add(True)
+        assert test.decision == "A"
+        evaluation = Evaluation("greedy", "random", 3, 0.05, 0.95)
+        assert evaluation.lineups == [[0, 1, 0], [1, 0, 0], [0, 0, 1]]
+        assert abs(evaluation.test.win_step - log(0.7166 / 0.6166)) < 1e-3
+        jobs = list(evaluation.jobs(10, "standard", 50, 4))
+        assert [job[0] for job in jobs] == [10, 10, 10, 11]
+        assert jobs[1][1] == ["random", "greedy", "greedy"]
+
+    def test_evaluate(self, capsys):
+        evaluate_main(["greedy", "random", "--seats", "2", "--max-games", "6", "--max-rounds", "20"])
+        report = capsys.readouterr().out
+        assert report.startswith("6 games")
+        assert "seat 1:" in report
+
+    def test_bot_process_protocol(self):
+        requests = [
+            {"type": "hello"},
+            {"type": "new_game", "seat": 0, "players": 2, "layout": {},
+                "actions": {"size": 300, "road": 2, "settlement": 74, "city": 128, "knight": 182}},
+            {"type": "act", "observation": [], "legal": [0, 1, 5, 130]},
+            {"type": "game_over", "winner": 1}
+        ]
+        stdout = io.StringIO()
+        serve("priority", io.StringIO("".join(json.dumps(request) + "\n" for request in requests)), stdout)
+        assert [json.loads(line) for line in stdout.getvalue().splitlines()] == [{"name": "priority"}, {"action": 130}]
+
+    def test_arena_pairings_and_ratings(self):
+        arena = Arena({"a": "", "b": "", "c": "", "d": "", "e": ""}, seats=4)
+        tables = arena.pairings(0, "swiss")
+        assert tables == [["a", "b", "c", "d"], ["e", "a", "b", "c"]]
+        arena.record(["a", "b", "c", "d"], 2)
+        assert arena.ratings["c"] == 1524 and arena.ratings["a"] == arena.ratings["d"] == 1492
+        assert arena.ratings["e"] == 1500
+        assert arena.pairings(1, "swiss")[0] == ["e", "a", "b", "c"] # best rated first, rotated by one seat
+
+    def test_arena_tournament(self):
+        command = f"{sys.executable} {BOT_PROCESS}"
+        arena = Arena({"random": f"{command} random", "priority": f"{command} priority",
+            "silent": f"{sys.executable} -c 'import time; time.sleep(5)'"},
+            seats=3, move_time=0.5, startup_time=0.5, max_rounds=10)
+        asyncio.run(arena.run(2, "round-robin"))
+        assert arena.games == {"random": 2, "priority": 2, "silent": 2}
+        assert len(arena.pools["random"].processes) == 1 # the warm process is reused for the second game
+        assert arena.pools["silent"].faults == 2
+        assert "silent: " in arena.standings()
+
+    def test_arena_replaces_faulted_bot(self, tmp_path):
+        stalled, answered = tmp_path / "stalled", tmp_path / "answered"
+        script = tmp_path / "stall_once.py"
+        script.write_text(f"""import json, os, random, sys, time
+for line in sys.stdin:
+    message = json.loads(line)
+    if message["type"] == "act" and not os.path.exists({str(stalled)!r}):
+        open({str(stalled)!r}, "w").close()
+        time.sleep(2)
+    if message["type"] == "act":
+        with open({str(answered)!r}, "a") as f:
+            f.write(f"{{os.getpid()}}\\n")
+    if message["type"] in ("hello", "place", "act"):
+        print(json.dumps({{"action": random.choice(message["legal"])}} if "legal" in message else {{"name": "x"}}), flush=True)
+""")
+        arena = Arena({"stall": f"{sys.executable} {script}", "random": f"{sys.executable} {BOT_PROCESS} random"},
+            seats=2, move_time=0.5, startup_time=5, max_rounds=5)
+        asyncio.run(arena.run(1))
+        pool = arena.pools["stall"]
+        assert pool.faults == 1 and len(pool.processes) == 2 # timed out once, then replaced
+        pids = answered.read_text().split()
+        assert len(pids) > 5 and set(pids) == {str(pool.processes[1].process.pid)} # the replacement played on
+        floats = tmp_path / "floats.py"
+        floats.write_text("""import json, random, sys
+for line in sys.stdin:
+    message = json.loads(line)
+    if message["type"] == "hello":
+        print(json.dumps({"name": "floats"}), flush=True)
+    elif "legal" in message:
+        print(json.dumps({"action": float(random.choice(message["legal"]))}), flush=True)
+""")
+        malformed = Arena({"floats": f"{sys.executable} {floats}", "random": f"{sys.executable} {BOT_PROCESS} random"},
+            seats=2, move_time=0.5, startup_time=5, max_rounds=2)
+        asyncio.run(malformed.run(1)) # every reply is a fault, but the game goes on
+        assert malformed.games == {"floats": 1, "random": 1} and malformed.pools["floats"].faults > 1
+        missing = Arena({"missing": "/nonexistent/bot", "random": f"{sys.executable} {BOT_PROCESS} random"},
+            seats=2, move_time=0.5, startup_time=5, max_rounds=2)
+        asyncio.run(missing.run(1)) # a bot that can't start forfeits its moves
+        assert missing.games == {"missing": 1, "random": 1} and missing.pools["missing"].faults == 1
+
+    def test_fuzz_finds_no_mismatches(self):
+        assert fuzz(30, seed=1) == []
+        # a road on edge 5 used to miss the roads of the tile's north-east neighbour
+        game = Position(2, [("road", 1, 19)]).build()
+        assert CHECKS["adjacent_roads"](game, Reference(game)) is None
+
+    def test_fuzz_shrinks_failures(self):
+        def faulty(game: Game, reference: Reference):
+            if any(len(player.roads) >= 2 for player in game.players):
+                return "two roads"
+        failures = fuzz(5, seed=2, checks={"faulty": faulty})
+        assert len(failures) == 1
+        name, position, message = failures[0]
+        assert message == "two roads"
+        assert [kind for kind, _, _ in position.placements] == ["road", "road"]
+        assert shrink(position, faulty).placements == position.placements
@@ -0,0 +1,113 @@
+"""Card counting: what each player could be holding, worked out from public events only"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from game import Game, Player, Resource, Construction
+
+class ResourceTracker:
+    """
+    Keeps, for every player, the exact hand size and a lower and upper bound on each resource count.
+    Bounds are updated in constant time per event from `Game.listeners`, so no history is replayed.
+    The observer's own hand, and any steal it takes part in, is known exactly.
+    Create the tracker while all hands are public, e.g. at the start of the game.
+    """
+
+    def __init__(self, game: Game, observer: Player):
+        self.observer = observer
+        self.index: Dict[Player, int] = {player: e for e, player in enumerate(game.players)}
+        self.total: List[int] = [len(player.resources) for player in game.players]
+        self.lower: List[List[int]] = [self.counts(player) for player in game.players]
+        self.upper: List[List[int]] = [self.counts(player) for player in game.players]
+        game.listeners.append(self.on_event)
+
+    @staticmethod
+    def counts(player: Player) -> List[int]:
+        return [player.resources.count(resource) for resource in Resource]
+
+    def bounds(self, player: Player, resource: Resource) -> Tuple[int, int]:
+        """Smallest and largest number of `resource` the player could be holding"""
+        i = self.index[player]
+        return self.lower[i][resource.value-1], self.upper[i][resource.value-1]
+
+    def expected(self, player: Player) -> List[float]:
+        """
+        Estimated count of each resource, spreading the unaccounted cards over each resource's slack.
+        This is a cheap approximation of the distribution, not an exact posterior.
+        """
+        i = self.index[player]
+        lower, upper = self.lower[i], self.upper[i]
+        unknown = self.total[i] - sum(lower)
+        slack = sum(upper) - sum(lower)
+        if not unknown or not slack:
+            return [float(count) for count in lower]
+        return [low + unknown * (high - low) / slack for low, high in zip(lower, upper)]
+
+    def on_event(self, event: str, player: Player, *args):
+        i = self.index[player]
+        match event:
+            case "collect" | "year of plenty":
+                for resource in args[0]:
+                    self.gain(i, resource.value-1, 1)
+            case "discard":
+                self.lose(i, args[0].value-1, 1)
+            case "spend":
+                for resource, count in Construction.construction_dict[args[0]].items():
+                    self.lose(i, resource.value-1, count)
+            case "steal":
+                victim, resource = args
+                v = self.index[victim]
+                if self.observer is player or self.observer is victim:
+                    self.lose(v, resource.value-1, 1)
+                    self.gain(i, resource.value-1, 1)
+                else:
+                    self.unknown_transfer(v, i)
+            case "trade":
+                partner, give, get = args
+                p = self.index[partner]
+                for resource in give:
+                    self.lose(i, resource.value-1, 1)
+                    self.gain(p, resource.value-1, 1)
+                for resource in get:
+                    self.lose(p, resource.value-1, 1)
+                    self.gain(i, resource.value-1, 1)
+            case "monopoly":
+                resource, taken = args
+                r = resource.value-1
+                for victim, count in taken:
+                    v = self.index[victim]
+                    self.total[v] -= count
+                    self.lower[v][r] = self.upper[v][r] = 0
+                    self.tighten(v)
+                    self.gain(i, r, count)
+
+    def gain(self, i: int, r: int, count: int):
+        self.total[i] += count
+        self.lower[i][r] += count
+        self.upper[i][r] += count
+        self.tighten(i)
+
+    def lose(self, i: int, r: int, count: int):
+        self.total[i] -= count
+        self.lower[i][r] = max(self.lower[i][r] - count, 0)
+        self.upper[i][r] = max(self.upper[i][r] - count, 0)
+        self.tighten(i)
+
+    def unknown_transfer(self, v: int, i: int):
+        """A single card of unknown type moves from player `v` to player `i`"""
+        for r in range(5):
+            if self.upper[v][r]:
+                self.upper[i][r] += 1
+            self.lower[v][r] = max(self.lower[v][r] - 1, 0)
+        self.total[v] -= 1
+        self.total[i] += 1
+        self.tighten(v)
+        self.tighten(i)
+
+    def tighten(self, i: int):
+        """Use the known hand size to narrow each resource's bounds against the others"""
+        total, lower, upper = self.total[i], self.lower[i], self.upper[i]
+        lower_sum = sum(lower)
+        for r in range(5):
+            upper[r] = min(upper[r], total - lower_sum + lower[r])
+        upper_sum = sum(upper)
+        for r in range(5):
+            lower[r] = max(lower[r], total - upper_sum + upper[r])
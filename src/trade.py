@@ -0,0 +1,133 @@
+"""
+Trades between players. Hands are five-element count vectors (one count per resource, in `Resource` order), and
+every bounded trade (by default up to 2-for-2, never giving and getting the same resource) is enumerated once.
+Vectors are also packed into integers with 8 bits per resource, so whether a hand covers one side of a trade is
+a single subtraction: a field that would go negative clears its guard bit. That checks a whole hand against a
+trade in one operation, and the table of trades for a pair of hands in one pass; the hands after a trade are
+likewise one addition and subtraction away.
+"""
+from __future__ import annotations
+from itertools import combinations_with_replacement
+from typing import Callable, Dict, List, Tuple
+from game import Game, Player, Resource, Construction
+
+Counts = Tuple[int, ...]
+
+GUARDS = sum(0x80 << (8 * r) for r in range(len(Resource)))
+
+def pack(counts: Counts) -> int:
+    return sum(min(count, 0x7f) << (8 * r) for r, count in enumerate(counts))
+
+def unpack(packed: int) -> Counts:
+    return tuple((packed >> (8 * r)) & 0x7f for r in range(len(Resource)))
+
+def covers(packed_hand: int, packed_need: int) -> bool:
+    """Whether a hand holds at least the needed count of every resource"""
+    return (packed_hand + GUARDS - packed_need) & GUARDS == GUARDS
+
+def counts(resources: List[Resource]) -> Counts:
+    vector = [0] * len(Resource)
+    for resource in resources:
+        vector[resource.value - 1] += 1
+    return tuple(vector)
+
+def trade_sides(most: int = 2) -> List[Counts]:
+    """Every count vector of 1 to `most` cards: one side of a bounded trade"""
+    return [counts(list(side)) for size in range(1, most + 1) for side in combinations_with_replacement(Resource, size)]
+
+# what each build needs, and how much having it in hand is worth
+BUILDS = [(item, counts([resource for resource, count in Construction.construction_dict[item].items()
+    for _ in range(count)]), weight)
+    for item, weight in (("City", 3.0), ("Settlement", 3.0), ("Development Card", 1.5), ("Road", 1.0))]
+
+def build_valuation(player: Player, hand: Counts) -> float:
+    """
+    Default valuation: progress towards each build, squared so that completing one counts most, and a little
+    for every card (which can still be spent later).
+    """
+    value = 0.01 * sum(hand)
+    for _, need, weight in BUILDS:
+        covered = sum(min(have, needed) for have, needed in zip(hand, need))
+        value += weight * (covered / sum(need)) ** 2
+    return value
+
+class TradeEngine:
+    """
+    Finds trades that both sides value, scoring hands with `valuation(player, counts)`.
+    The acceptable trades between two players are cached until either of their hands changes, and each player's
+    valuation of a hand is memoised in `values`: clear it if a valuation depends on more than the hand.
+    """
+
+    def __init__(self, game: Game, valuation: Callable[[Player, Counts], float] = build_valuation, most: int = 2,
+            margin: float = 1e-6):
+        self.game = game
+        self.valuation = valuation
+        self.margin = margin
+        self.sides = trade_sides(most)
+        self.packed = [pack(side) for side in self.sides]
+        self.resources = [[Resource(r + 1) for r, count in enumerate(side) for _ in range(count)] for side in self.sides]
+        # which sides can be swapped: a trade never gives and gets the same resource
+        self.swappable = [[not any(a and b for a, b in zip(give, get)) for get in self.sides] for give in self.sides]
+        self.cache: Dict[Tuple[Player, Player], Tuple[int, int, List[Tuple[float, float, int, int]]]] = {}
+        self.values: Dict[Tuple[Player, int], float] = {}
+
+    def value(self, player: Player, packed: int) -> float:
+        key = (player, packed)
+        if key not in self.values:
+            self.values[key] = self.valuation(player, unpack(packed))
+        return self.values[key]
+
+    def acceptable(self, player: Player, partner: Player) -> List[Tuple[float, float, int, int]]:
+        """
+        (gain for `player`, gain for `partner`, side given, side got) of every trade both would take, best first.
+        Sides index `sides`; each hand is checked against every side once, and only the pairs both hands cover
+        are scored.
+        """
+        packed, partner_packed = pack(counts(player.resources)), pack(counts(partner.resources))
+        cached = self.cache.get((player, partner))
+        if cached is not None and cached[0] == packed and cached[1] == partner_packed:
+            return cached[2]
+        guarded, partner_guarded = packed + GUARDS, partner_packed + GUARDS # `covers`, inlined for the whole table
+        gives = [s for s, side in enumerate(self.packed) if (guarded - side) & GUARDS == GUARDS]
+        gets = [s for s, side in enumerate(self.packed) if (partner_guarded - side) & GUARDS == GUARDS]
+        value = self.value
+        base, partner_base = value(player, packed), value(partner, partner_packed)
+        matches = []
+        for g in gives:
+            give, swappable = self.packed[g], self.swappable[g]
+            for h in gets:
+                if not swappable[h]:
+                    continue
+                get = self.packed[h]
+                gain = value(player, packed - give + get) - base
+                if gain <= self.margin:
+                    continue
+                partner_gain = value(partner, partner_packed + give - get) - partner_base
+                if partner_gain > self.margin:
+                    matches.append((gain, partner_gain, g, h))
+        matches.sort(reverse=True)
+        self.cache[(player, partner)] = (packed, partner_packed, matches)
+        return matches
+
+    def best_trade(self, player: Player) -> Tuple[Player, List[Resource], List[Resource]] | None:
+        """The mutually acceptable trade with any other player that `player` gains most from, if there is one"""
+        best = None
+        for partner in self.game.players:
+            if partner is player:
+                continue
+            matches = self.acceptable(player, partner)
+            if matches and (best is None or matches[0][:2] > best[0][:2]):
+                best = (matches[0], partner)
+        if best is None:
+            return None
+        (_, _, give, get), partner = best
+        return partner, self.resources[give], self.resources[get]
+
+    def execute(self, player: Player) -> bool:
+        """Make the best trade for `player`; False if nobody would trade"""
+        trade = self.best_trade(player)
+        if trade is None:
+            return False
+        partner, give, get = trade
+        player.trade(partner, give, get)
+        return True
@@ -0,0 +1,157 @@
+"""
+An explicit turn state machine over `ActionSpace` ids, for simulation and search:
+
+    roll -> (on a 7) discard -> robber -> steal -> build -> end
+
+At every point one player owes a decision (`actor`), `legal_mask` marks the actions valid in the current phase,
+and `step` applies one of them. A knight played while building moves the robber and goes on to the steal.
+Discards are made one resource at a time, by every player holding more than 7 cards, in turn order.
+"""
+from __future__ import annotations
+from array import array
+from enum import Enum, auto
+from typing import Callable, Tuple
+from game import Game, Player, Resource
+from encoder import ActionSpace
+
+class Phase(Enum):
+    Roll = auto()
+    Discard = auto()
+    Robber = auto()
+    Steal = auto()
+    Build = auto()
+    Over = auto()
+
+class TurnMachine:
+    """
+    Drives the turns of a game whose starting placements are done. Per-step state lives in preallocated
+    arrays and the action space's reusable mask, so stepping allocates nothing beyond the engine's own work.
+    """
+
+    def __init__(self, game: Game, actions: ActionSpace | None = None):
+        self.game = game
+        self.actions = actions or ActionSpace(game)
+        self.seats = {player: e for e, player in enumerate(game.players)}
+        self.phase = Phase.Roll
+        self.actor: Player = game.current_actor
+        self.last_roll = 0
+        self.owed = array("b", bytes(len(game.players))) # discards still owed, by seat
+        self.victims = array("b", bytes(len(game.players))) # players that can be stolen from, by seat
+
+    @property
+    def winner(self) -> Player | None:
+        return self.game.ledger.winner
+
+    def legal_mask(self) -> array:
+        """Mark every action the actor can take in the current phase with a 1"""
+        actions, board = self.actions, self.game.board
+        if self.phase is Phase.Build:
+            return actions.legal_mask(self.actor)
+        mask = actions.mask
+        mask[:] = actions.blank
+        match self.phase:
+            case Phase.Roll:
+                mask[actions.roll_action] = 1
+            case Phase.Discard:
+                for resource in self.actor.resources:
+                    mask[actions.discard_offset + resource.value - 1] = 1
+            case Phase.Robber:
+                for e, tile in enumerate(board.flat_tiles):
+                    if tile is not board.robber_tile:
+                        mask[actions.robber_offset + e] = 1
+            case Phase.Steal:
+                for seat, victim in enumerate(self.victims):
+                    mask[actions.steal_offset + seat] = victim
+        return mask
+
+    def step(self, action: int):
+        """Apply a legal action of the actor and move on to whoever owes the next decision"""
+        game, board, actions = self.game, self.game.board, self.actions
+        player = self.actor
+        kind, idx = actions.decode(action)
+        match self.phase, kind:
+            case Phase.Roll, "Roll":
+                self.roll()
+            case Phase.Discard, "Discard":
+                player.discard(Resource(idx + 1))
+                self.owed[self.seats[player]] -= 1
+                self.next_discard()
+            case Phase.Robber, "Robber":
+                self.move_robber(board.flat_tiles[idx])
+            case Phase.Steal, "Steal":
+                assert self.victims[idx], 5
+                player.steal_random_resource(game.players[idx])
+                self.phase = Phase.Build
+            case Phase.Build, "Knight":
+                card = actions.usable_knight(player)
+                assert card is not None, 5
+                x, y = board.positions[board.flat_tiles[idx]]
+                self.find_victims(player.use_card(card, board, x, y) or [])
+            case Phase.Build, "End Turn":
+                if not game.end_turn():
+                    self.phase = Phase.Roll
+                    self.actor = game.current_actor
+            case Phase.Build, "Development Card" | "Road" | "Settlement" | "City" | "Trade":
+                actions.apply(player, action)
+            case _:
+                raise Exception(f"{kind} is not an action of the {self.phase.name} phase")
+        if game.ledger.winner is not None:
+            self.phase = Phase.Over
+
+    def roll(self, number: int | None = None):
+        """Roll for the current player, or force the dice to `number`, e.g. to expand a chance node"""
+        game = self.game
+        self.last_roll = game.begin_turn(self.actor, number)
+        if self.last_roll != 7:
+            self.phase = Phase.Build
+            return
+        for seat, player in enumerate(game.players):
+            self.owed[seat] = game.discards_owed(player)
+        self.next_discard()
+
+    def next_discard(self):
+        """Hand the decision to the next player in turn order who owes a discard, or on to the robber"""
+        players = self.game.players
+        start = self.seats[self.game.current_actor]
+        for e in range(len(players)):
+            seat = (start + e) % len(players)
+            if self.owed[seat]:
+                self.phase = Phase.Discard
+                self.actor = players[seat]
+                return
+        self.phase = Phase.Robber
+        self.actor = self.game.current_actor
+
+    def move_robber(self, tile):
+        x, y = self.game.board.positions[tile]
+        self.find_victims(self.game.board.move_robber(self.actor, x, y))
+
+    def find_victims(self, players):
+        """Steal next if any of `players` holds a resource, otherwise go on building"""
+        for seat, player in enumerate(self.game.players):
+            self.victims[seat] = player in players and len(player.resources) > 0
+        self.phase = Phase.Steal if any(self.victims) else Phase.Build
+
+    def snapshot(self) -> Tuple:
+        return (self.game.snapshot(), self.phase, self.actor, self.last_roll, self.owed[:], self.victims[:])
+
+    def restore(self, snapshot: Tuple):
+        """Rewind the game and the machine to a `snapshot`"""
+        game_snapshot, self.phase, self.actor, self.last_roll, owed, victims = snapshot
+        self.game.restore(game_snapshot)
+        self.owed[:] = owed
+        self.victims[:] = victims
+
+    def play(self, decide: Callable[[Player, array], int], max_rounds: int | None = None,
+            turn_hook: Callable[[Game], None] | None = None) -> Player | None:
+        """
+        Play until there is a winner, asking `decide(player, legal_mask)` for every decision.
+        `turn_hook` is called with the game at the start of every turn. Like `Game.game_wrapper`,
+        return the winner, or None if `max_rounds` pass without one.
+        """
+        game = self.game
+        while self.phase is not Phase.Over and (max_rounds is None or game.round <= max_rounds):
+            if turn_hook and self.phase is Phase.Roll:
+                turn_hook(game)
+            self.step(decide(self.actor, self.legal_mask()))
+        return self.winner